@@ -0,0 +1,113 @@
+import os, sys, json, time
+import argparse
+import platform
+import statistics
+
+#Metrics compared against baseline and whether higher value is better
+TRACKED_METRICS = {"ops_per_sec": True, "p50_us": False}
+
+def measure(func, args_list: list, min_time: float = 0.2, rounds: int = 5, latency_samples: int = 2000) -> dict:
+    """Measures throughput of func over args_list(best of rounds, each at least min_time seconds)
+       and per-call latency percentiles"""
+
+    best_ops = 0.0
+    for _ in range(rounds):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            for args in args_list:
+                func(*args)
+            calls += len(args_list)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best_ops = max(best_ops, calls / elapsed)
+
+    latencies = []
+    perf_counter_ns = time.perf_counter_ns
+    while len(latencies) < latency_samples:
+        for args in args_list:
+            start = perf_counter_ns()
+            func(*args)
+            latencies.append((perf_counter_ns() - start) / 1000)
+    latencies.sort()
+
+    return {
+        "ops_per_sec": round(best_ops, 1),
+        "mean_us": round(statistics.fmean(latencies), 3),
+        "p50_us": round(latencies[len(latencies) // 2], 3),
+        "p99_us": round(latencies[int(len(latencies) * 0.99)], 3),
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Returns descriptions of tracked metrics which regressed more than threshold percents"""
+
+    regressions = []
+    for name, metrics in results.items():
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            try:
+                base_value = baseline[name][metric]
+                value = metrics[metric]
+            except KeyError:
+                continue
+            if not base_value:
+                continue
+            change = (value - base_value) / base_value * 100
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{name}.{metric}: {value} vs baseline {base_value} ({change:+.1f}%)")
+    return regressions
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)["results"]
+
+def save_baseline(path: str, results: dict):
+    document = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(document, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+def run_suite(description: str, benchmarks: dict, baseline_path: str, argv: list | None = None) -> int:
+    """Common CLI of benchmark suites. benchmarks maps benchmark name to (func, args_list).
+       Returns process exit code: 1 if any tracked metric regressed past the threshold"""
+
+    argParser = argparse.ArgumentParser(description=description)
+    argParser.add_argument('--threshold', type = float, default = 25.0,
+                            help = "Allowed regression of tracked metrics in percents (default: %(default)s)")
+    argParser.add_argument('--min-time', type = float, default = 0.2,
+                            help = "Minimal duration of one measurement round in seconds (default: %(default)s)")
+    argParser.add_argument('--rounds', type = int, default = 5,
+                            help = "Number of measurement rounds (default: %(default)s)")
+    argParser.add_argument('-k', '--filter', type = str, default = None,
+                            help = "Run only benchmarks which names contain the substring")
+    argParser.add_argument('--update-baseline', action = "store_true",
+                            help = "Store results as a new baseline instead of comparing with it")
+    args = argParser.parse_args(argv)
+
+    results = {}
+    for name, (func, args_list) in benchmarks.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(func, args_list, min_time=args.min_time, rounds=args.rounds)
+        print(f"{name:<40} {results[name]['ops_per_sec']:>12,.0f} ops/s  p50 {results[name]['p50_us']:>9.2f} us  "
+              f"p99 {results[name]['p99_us']:>9.2f} us", file=sys.stderr)
+
+    if args.update_baseline:
+        baseline = load_baseline(baseline_path)
+        baseline.update(results)
+        save_baseline(baseline_path, baseline)
+        print(f"[+] Baseline was saved to {baseline_path}", file=sys.stderr)
+        regressions = []
+    else:
+        regressions = compare(results, load_baseline(baseline_path), args.threshold)
+
+    print(json.dumps({"results": results, "regressions": regressions}, indent=2))
+    for regression in regressions:
+        print(f"[-] Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,75 @@
+"""Calls/sec of the CLI encoder, spawned once per payload vs. one `r3dir coprocess`. Run from repository root:
+
+    python -m benchmarks.bench_cli [--spawns N] [--requests N]
+
+Co-process requests are sent over a pipe one at a time, waiting for every response,
+like a tool which needs the domain before sending the payload. `pipelined` sends all
+requests before reading the responses.
+"""
+import sys, json, time
+import argparse
+import itertools
+import subprocess
+import threading
+
+from benchmarks import corpus
+
+COMMAND = [sys.executable, "-m", "r3dir"]
+
+
+def measure_spawn(calls: int) -> float:
+    targets = itertools.cycle(corpus.TARGETS)
+    start = time.perf_counter()
+    for _ in range(calls):
+        subprocess.run([*COMMAND, "encode", next(targets)], stdout=subprocess.DEVNULL, check=True)
+    return calls / (time.perf_counter() - start)
+
+def _requests(calls: int) -> list[bytes]:
+    targets = itertools.cycle(corpus.TARGETS)
+    return [json.dumps({"id": i, "target": next(targets)}).encode("UTF-8") + b"\n" for i in range(calls)]
+
+def measure_coprocess(calls: int, pipelined: bool) -> float:
+    requests = _requests(calls)
+    process = subprocess.Popen([*COMMAND, "coprocess"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        #start-up isn't measured, it's paid once
+        process.stdin.write(requests[0])
+        process.stdin.flush()
+        process.stdout.readline()
+        start = time.perf_counter()
+        if pipelined:
+            writer = threading.Thread(target=lambda: (process.stdin.writelines(requests), process.stdin.flush()))
+            writer.start()
+            for _ in requests:
+                process.stdout.readline()
+            writer.join()
+        else:
+            for request in requests:
+                process.stdin.write(request)
+                process.stdin.flush()
+                process.stdout.readline()
+        return calls / (time.perf_counter() - start)
+    finally:
+        process.stdin.close()
+        process.wait()
+
+def main(argv: list | None = None) -> int:
+    argParser = argparse.ArgumentParser(description='r3dir CLI spawn vs. co-process benchmark')
+    argParser.add_argument('--spawns', type = int, default = 50,
+                            help = "Number of spawned CLI calls (default: %(default)s)")
+    argParser.add_argument('--requests', type = int, default = 20000,
+                            help = "Number of co-process requests (default: %(default)s)")
+    args = argParser.parse_args(argv)
+
+    results = {
+        "spawn": round(measure_spawn(args.spawns), 1),
+        "coprocess": round(measure_coprocess(args.requests, pipelined=False), 1),
+        "coprocess_pipelined": round(measure_coprocess(args.requests, pipelined=True), 1),
+    }
+    report = {mode: {"calls_per_sec": value, "speedup": round(value / results["spawn"], 1)}
+              for mode, value in results.items()}
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
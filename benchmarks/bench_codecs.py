@@ -0,0 +1,38 @@
+"""Size and speed comparison of r3dir compression codecs. Run from repository root:
+
+    python -m benchmarks.bench_codecs
+"""
+import sys, json
+import statistics
+
+from r3dir import encoder
+from benchmarks import corpus
+from benchmarks._utils import measure
+
+def _sizes(codec: str) -> dict:
+    lengths = [len("".join(encoder._b32encode_dns(target, codec))) for target in corpus.TARGETS + corpus.TOO_LONG_TARGETS]
+    return {
+        "mean_encoded_length": round(statistics.fmean(lengths), 1),
+        "max_encoded_length": max(lengths),
+        "fit_https_limit": sum(length <= encoder.MAX_SUBDOMAIN_LENGTH for length in lengths),
+        "targets": len(lengths),
+    }
+
+def main() -> int:
+    results = {"mean_target_length": round(statistics.fmean(len(target) for target in corpus.TARGETS), 1)}
+    for codec in ("auto", *encoder.CODECS):
+        subdomains = [encoder._b32encode_dns(target, codec) for target in corpus.TARGETS]
+        results[codec] = {
+            **_sizes(codec),
+            "encode": measure(encoder._b32encode_dns, [(target, codec) for target in corpus.TARGETS]),
+            "decode": measure(encoder._b32decode_dns, [(chunks,) for chunks in subdomains]),
+        }
+        print(f"{codec:<10} mean length {results[codec]['mean_encoded_length']:>6}  "
+              f"fit HTTPS {results[codec]['fit_https_limit']}/{results[codec]['targets']}  "
+              f"encode {results[codec]['encode']['ops_per_sec']:>10,.0f} ops/s  "
+              f"decode {results[codec]['decode']['ops_per_sec']:>10,.0f} ops/s", file=sys.stderr)
+    print(json.dumps({"results": results}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
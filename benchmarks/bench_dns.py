@@ -0,0 +1,111 @@
+"""Queries/sec benchmark of the built-in DNS responder on localhost. Run from repository root:
+
+    python -m benchmarks.bench_dns [--duration SECONDS] [--concurrency N]
+
+The responder runs in a separate process, the client keeps N queries in flight over UDP.
+"""
+import sys, json, time
+import asyncio
+import argparse
+import itertools
+import multiprocessing
+import socket
+
+from r3dir.server import dns
+from benchmarks import corpus
+from benchmarks._utils import measure
+
+def _serve(port: int, ready):
+    async def serve():
+        await dns.start_dns_server(corpus.MAIN_DOMAIN, ["127.0.0.1"], ["::1"], host="127.0.0.1", port=port)
+        ready.set()
+        await asyncio.Event().wait()
+    asyncio.run(serve())
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def _load(port: int, queries: list[bytes], duration: float, concurrency: int) -> dict:
+    loop = asyncio.get_running_loop()
+    pending = {}
+    latencies = []
+    answered = timeouts = 0
+    ids = itertools.cycle(range(1, 65536))
+    queries = itertools.cycle(queries)
+
+    class Client(asyncio.DatagramProtocol):
+        def datagram_received(self, data, addr):
+            nonlocal answered
+            query_id = int.from_bytes(data[:2], "big")
+            start = pending.pop(query_id, None)
+            if start is not None:
+                answered += 1
+                latencies.append(time.perf_counter() - start)
+                send_next()
+
+    def send_next():
+        if time.perf_counter() >= deadline:
+            return
+        query_id = next(ids)
+        query = next(queries)
+        pending[query_id] = time.perf_counter()
+        transport.sendto(query_id.to_bytes(2, "big") + query[2:])
+
+    transport, _ = await loop.create_datagram_endpoint(Client, remote_addr=("127.0.0.1", port))
+    started = time.perf_counter()
+    deadline = started + duration
+    for _ in range(concurrency):
+        send_next()
+    #Lost datagrams are resent after a timeout to keep the pool full
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+        now = time.perf_counter()
+        for query_id, start in list(pending.items()):
+            if now - start > 0.5:
+                del pending[query_id]
+                timeouts += 1
+                send_next()
+    elapsed = time.perf_counter() - started
+    transport.close()
+
+    latencies.sort()
+    return {
+        "queries_per_sec": round(answered / elapsed, 1),
+        "answered": answered,
+        "timeouts": timeouts,
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 1) if latencies else None,
+        "p99_us": round(latencies[int(len(latencies) * 0.99)] * 1e6, 1) if latencies else None,
+    }
+
+def main(argv: list | None = None) -> int:
+    argParser = argparse.ArgumentParser(description='r3dir DNS responder benchmark')
+    argParser.add_argument('--duration', type = float, default = 5.0,
+                            help = "Duration of UDP load in seconds (default: %(default)s)")
+    argParser.add_argument('--concurrency', type = int, default = 64,
+                            help = "Number of queries in flight (default: %(default)s)")
+    args = argParser.parse_args(argv)
+
+    queries = [dns.build_query(domain) for domain in corpus.DOMAINS]
+    queries.append(dns.build_query(f"non-encoded.302.{corpus.MAIN_DOMAIN}"))
+
+    responder = dns.DNSResponder(corpus.MAIN_DOMAIN, ["127.0.0.1"], ["::1"])
+    results = {"handle": measure(responder.handle, [(query,) for query in queries])}
+
+    port = _free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=_serve, args=(port, ready), daemon=True)
+    server.start()
+    try:
+        ready.wait(10)
+        results["udp"] = asyncio.run(_load(port, queries, args.duration, args.concurrency))
+    finally:
+        server.terminate()
+        server.join()
+
+    print(json.dumps({"results": results}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
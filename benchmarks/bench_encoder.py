@@ -0,0 +1,34 @@
+"""Micro-benchmarks of r3dir encoder. Run from repository root:
+
+    python -m benchmarks.bench_encoder [--threshold PERCENTS] [--update-baseline]
+"""
+import os, sys
+
+from r3dir import encoder
+from benchmarks import corpus
+from benchmarks._utils import run_suite
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'baseline_encoder.json')
+
+def _benchmarks() -> dict:
+    main_domain = corpus.MAIN_DOMAIN
+    subdomains = [encoder._b32encode_dns(target) for target in corpus.TARGETS]
+    legacy_domains = [result for _, result, _ in encoder.encode_many(corpus.TARGETS, 302, main_domain, codec="unishox2") if result]
+    return {
+        "encode": (encoder.encode, [(target, 302, main_domain) for target in corpus.TARGETS]),
+        "encode.unishox2": (encoder.encode, [(target, 302, main_domain, None, False, True, "unishox2")
+                                             for target in corpus.TARGETS]),
+        "encode.deflate": (encoder.encode, [(target, 302, main_domain, None, False, True, "deflate")
+                                            for target in corpus.TARGETS]),
+        "encode.short": (encoder.encode, [(target, 302, main_domain) for target in corpus.SHORT_TARGETS]),
+        "encode.near_limit": (encoder.encode, [(target, 302, main_domain) for target in corpus.NEAR_LIMIT_TARGETS]),
+        "encode.silent_mode_sha1": (encoder.encode, [(target, 302, main_domain, None, False, True)
+                                                     for target in corpus.TOO_LONG_TARGETS]),
+        "decode": (encoder.decode, [(domain, main_domain) for domain in corpus.DOMAINS]),
+        "decode.unishox2": (encoder.decode, [(domain, main_domain) for domain in legacy_domains]),
+        "_b32encode_dns": (encoder._b32encode_dns, [(target,) for target in corpus.TARGETS]),
+        "_b32decode_dns": (encoder._b32decode_dns, [(chunks,) for chunks in subdomains]),
+    }
+
+if __name__ == "__main__":
+    sys.exit(run_suite("r3dir encoder micro-benchmarks", _benchmarks(), BASELINE_PATH))
@@ -0,0 +1,165 @@
+"""End-to-end load test of the redirect server, including middlewares, logging and the event loop.
+Run from repository root:
+
+    python -m benchmarks.bench_load [--duration SECONDS] [--connections N] [--mix domain=70 ...]
+    python -m benchmarks.bench_load --url http://127.0.0.1:8080 -d your.host
+
+Without `--url`, `r3dir.server.app:app` is started locally with `--setting NAME=VALUE` environment variables.
+The client pool keeps N keep-alive connections busy with a weighted mix of domain-based, parameter-based,
+CORS preflight and malformed-host requests. Hosts are sent in Host header only, so no DNS is needed.
+"""
+import os, sys, json, time
+import asyncio
+import argparse
+import multiprocessing
+import random
+from urllib.parse import quote, urlsplit
+
+from benchmarks import corpus
+from benchmarks.bench_serve import _free_port, _wait_ready
+
+DEFAULT_MIX = {"domain": 70, "parameter": 15, "preflight": 10, "malformed": 5}
+#Hosts, which fail to decode: broken base32, status code out of range, no status code
+MALFORMED_HOSTS = ("0000.302", "1in3raaa.999", "1in3raaa")
+
+
+def _request(method: str, path: str, host: str, headers: str = "") -> bytes:
+    return f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n{headers}\r\n".encode("UTF-8")
+
+def build_requests(main_domain: str, mix: dict, size: int = 1000, seed: int = 0) -> list[tuple[str, bytes]]:
+    """Shuffled (kind, raw HTTP request) pairs in proportions of `mix` weights"""
+
+    domains = [corpus.encoder.encode(target, 302, main_domain) for target in corpus.TARGETS]
+    kinds = {
+        "domain": [_request("GET", "/", domain) for domain in domains],
+        "parameter": [_request("GET", f"/--to/?url={quote(target, safe='')}", f"307.{main_domain}")
+                      for target in corpus.TARGETS],
+        "preflight": [_request("OPTIONS", "/", domain, "Origin: http://example.com\r\n"
+                                                      "Access-Control-Request-Method: GET\r\n") for domain in domains],
+        "malformed": [_request("GET", "/", f"{host}.{main_domain}") for host in MALFORMED_HOSTS],
+    }
+    total = sum(mix.values())
+    requests = []
+    for kind, weight in mix.items():
+        variants = kinds[kind]
+        requests.extend((kind, variants[i % len(variants)]) for i in range(round(size * weight / total)))
+    random.Random(seed).shuffle(requests)
+    return requests
+
+async def _connection(host: str, port: int, requests: list, offset: int, deadline: float, results: dict):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        i = offset
+        while time.perf_counter() < deadline:
+            kind, request = requests[i % len(requests)]
+            i += 1
+            start = time.perf_counter()
+            writer.write(request)
+            headers = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in headers.split(b"\r\n"):
+                if line[:15].lower() == b"content-length:":
+                    length = int(line[15:])
+            await reader.readexactly(length)
+            latency = time.perf_counter() - start
+            status = headers[9:12].decode("latin-1")
+            latencies, statuses = results.setdefault(kind, ([], {}))
+            latencies.append(latency)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+async def run_load(host: str, port: int, requests: list, duration: float, connections: int) -> dict:
+    """Runs the client pool for `duration` seconds. Returns latencies and status codes of every request kind"""
+
+    results = {}
+    deadline = time.perf_counter() + duration
+    outcomes = await asyncio.gather(*(_connection(host, port, requests, i * len(requests) // connections, deadline, results)
+                                      for i in range(connections)), return_exceptions=True)
+    errors = [f"{type(e).__name__}: {e}" for e in outcomes if isinstance(e, Exception)]
+    return {"kinds": results, "errors": errors}
+
+def _percentiles(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {}
+    return {f"p{q}_ms": round(latencies[min(int(len(latencies) * q / 100), len(latencies) - 1)] * 1000, 3)
+            for q in (50, 95, 99)}
+
+def summarize(results: dict, duration: float) -> dict:
+    """JSON report with requests/sec and latency percentiles, overall and per request kind"""
+
+    kinds = {}
+    for kind, (latencies, statuses) in sorted(results["kinds"].items()):
+        kinds[kind] = {"requests": len(latencies), "requests_per_sec": round(len(latencies) / duration, 1),
+                       **_percentiles(latencies), "status_codes": dict(sorted(statuses.items()))}
+    latencies = [latency for kind_latencies, _ in results["kinds"].values() for latency in kind_latencies]
+    return {"requests": len(latencies), "requests_per_sec": round(len(latencies) / duration, 1),
+            **_percentiles(latencies), "kinds": kinds, "connection_errors": results["errors"]}
+
+def _serve(port: int, workers: int, settings: dict):
+    from r3dir.server.serve import serve
+    #access log would flood the report, it's still written and measured
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.dup2(devnull, sys.stderr.fileno())
+    serve("127.0.0.1", port, workers, settings, log_level="warning")
+
+def _parse_pairs(pairs: list, cast=str) -> dict:
+    result = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        result[name] = cast(value)
+    return result
+
+def main(argv: list | None = None) -> int:
+    argParser = argparse.ArgumentParser(description='r3dir server end-to-end load test')
+    argParser.add_argument('--url', type = str, default = None,
+                            help = "Running server to test, e.g. http://127.0.0.1:8080 (default: start r3dir.server.app:app locally)")
+    argParser.add_argument('-d', '--main_domain', type = str, default = corpus.MAIN_DOMAIN,
+                            help = "Main domain of the server (default: %(default)s)")
+    argParser.add_argument('--duration', type = float, default = 10.0,
+                            help = "Duration of load in seconds (default: %(default)s)")
+    argParser.add_argument('--connections', type = int, default = 32,
+                            help = "Number of concurrent keep-alive connections (default: %(default)s)")
+    argParser.add_argument('--mix', type = str, nargs = '+', default = [f"{kind}={weight}" for kind, weight in DEFAULT_MIX.items()],
+                            help = "Weights of request kinds: domain, parameter, preflight, malformed (default: %(default)s)")
+    argParser.add_argument('--workers', type = int, default = 1,
+                            help = "Number of workers of the local server (default: %(default)s)")
+    argParser.add_argument('--setting', type = str, action = 'append', default = [], metavar = 'NAME=VALUE',
+                            help = "Environment variable of the local server, e.g. ACCESS_LOG_MODE=queue (can be repeated)")
+    args = argParser.parse_args(argv)
+
+    mix = _parse_pairs(args.mix, int)
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        argParser.error(f"unknown request kinds: {', '.join(sorted(unknown))}")
+    requests = build_requests(args.main_domain, mix)
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        settings = {"MAIN_DOMAIN": args.main_domain, **_parse_pairs(args.setting)}
+        server = multiprocessing.Process(target=_serve, args=(port, args.workers, settings))
+        server.start()
+    try:
+        if server is not None:
+            _wait_ready(port)
+        #warming up caches and connections
+        asyncio.run(run_load(host, port, requests, min(1.0, args.duration), args.connections))
+        results = asyncio.run(run_load(host, port, requests, args.duration, args.connections))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    report = {"url": args.url or f"http://{host}:{port}", "connections": args.connections, "duration": args.duration,
+              "mix": mix, **summarize(results, args.duration)}
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Requests/sec of `r3dir serve` with different numbers of workers on localhost. Run from repository root:
+
+    python -m benchmarks.bench_serve [--workers 1 2 4] [--duration SECONDS] [--clients N] [--connections N]
+
+The server runs in separate processes, load is generated by N client processes,
+each of them keeps M keep-alive connections busy with domain-based redirects.
+Client processes take CPU time too, so scaling is only meaningful while
+workers + clients don't exceed the number of CPU cores.
+"""
+import os, sys, json, time
+import asyncio
+import argparse
+import itertools
+import multiprocessing
+import socket
+
+from benchmarks import corpus
+
+
+def _serve(port: int, workers: int, fast_asgi: bool):
+    from r3dir.server.serve import serve
+    #access log of workers would flood the report
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    settings = {"MAIN_DOMAIN": corpus.MAIN_DOMAIN, "ACCESS_LOG_MODE": "queue", "FAST_ASGI": str(fast_asgi).lower()}
+    serve("127.0.0.1", port, workers, settings, log_level="warning")
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _wait_ready(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError("server didn't start")
+
+async def _connection(port: int, requests, deadline: float) -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    served = 0
+    try:
+        while time.perf_counter() < deadline:
+            writer.write(next(requests))
+            headers = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in headers.split(b"\r\n"):
+                if line[:15].lower() == b"content-length:":
+                    length = int(line[15:])
+            await reader.readexactly(length)
+            served += 1
+    finally:
+        writer.close()
+    return served
+
+def _client(port: int, connections: int, duration: float, results):
+    requests = itertools.cycle([f"GET / HTTP/1.1\r\nHost: {domain}\r\n\r\n".encode("ascii") for domain in corpus.DOMAINS])
+
+    async def load():
+        deadline = time.perf_counter() + duration
+        return sum(await asyncio.gather(*(_connection(port, requests, deadline) for _ in range(connections))))
+    results.put(asyncio.run(load()))
+
+def measure_workers(workers: int, duration: float, clients: int, connections: int, fast_asgi: bool) -> float:
+    port = _free_port()
+    server = multiprocessing.Process(target=_serve, args=(port, workers, fast_asgi))
+    server.start()
+    try:
+        _wait_ready(port)
+        #warming up every worker
+        _client(port, workers * 2, 0.5, multiprocessing.Queue())
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_client, args=(port, connections, duration, results))
+                     for _ in range(clients)]
+        for process in processes:
+            process.start()
+        served = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.join()
+    return served / duration
+
+def main(argv: list | None = None) -> int:
+    argParser = argparse.ArgumentParser(description='r3dir serve scaling benchmark')
+    argParser.add_argument('--workers', type = int, nargs = '+', default = [1, 2, 4],
+                            help = "Numbers of server workers to measure (default: %(default)s)")
+    argParser.add_argument('--duration', type = float, default = 5.0,
+                            help = "Duration of load in seconds (default: %(default)s)")
+    argParser.add_argument('--clients', type = int, default = 2,
+                            help = "Number of client processes (default: %(default)s)")
+    argParser.add_argument('--connections', type = int, default = 32,
+                            help = "Keep-alive connections per client process (default: %(default)s)")
+    argParser.add_argument('--fast_asgi', action = 'store_true',
+                            help = "Measure FAST_ASGI application instead of Starlette one")
+    args = argParser.parse_args(argv)
+
+    results = {}
+    for workers in args.workers:
+        results[workers] = round(measure_workers(workers, args.duration, args.clients, args.connections, args.fast_asgi), 1)
+    base = results[args.workers[0]] / args.workers[0]
+    report = {
+        "cpu_count": os.cpu_count(),
+        "results": {workers: {"requests_per_sec": value, "scaling": round(value / base / workers, 2)}
+                    for workers, value in results.items()},
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+from r3dir import encoder
+from r3dir.exceptions import TooLongTarget
+
+MAIN_DOMAIN = "r3dir.me"
+
+SHORT_TARGETS = [
+    "http://127.0.0.1",
+    "http://localhost",
+    "http://0",
+    "http://[::1]",
+    "http://2130706433",
+    "http://0x7f000001",
+    "http://10.0.0.1:8080",
+]
+
+METADATA_TARGETS = [
+    "http://169.254.169.254/latest/meta-data",
+    "http://169.254.169.254/latest/meta-data/iam/security-credentials/",
+    "http://metadata.google.internal/computeMetadata/v1/instance/",
+    "http://169.254.169.254/metadata/instance?api-version=2021-02-01",
+    "http://100.100.100.200/latest/meta-data/",
+    "http://169.254.170.2/v2/credentials",
+]
+
+LONG_PATH_TARGETS = [
+    "http://localhost:8080/admin/api/v1/users/list?limit=100&offset=0&sort=created_at",
+    "http://internal-service.default.svc.cluster.local:9000/debug/pprof/goroutine?debug=2",
+    "file:///etc/passwd",
+    "gopher://127.0.0.1:6379/_INFO%0d%0a",
+    "dict://127.0.0.1:11211/stats",
+    "gopher://metadata.google.internal:80/xGET%20/computeMetadata/v1/instance/attributes/ssh-keys%20HTTP%2f%31%2e%31%0AHost:%20metadata.google.internal%0AAccept:%20%2a%2f%2a%0aMetadata-Flavor:%20Google%0d%0aTestHeader:%20Google",
+]
+
+UNICODE_TARGETS = [
+    "http://пример.рф/путь",
+    "http://例え.テスト/パス",
+    "http://ümlaut.example/ä?ö=ü",
+]
+
+#Too long for encoder with any codec, silent mode produces SHA-1 error domain
+TOO_LONG_TARGETS = [
+    "http://10.12.34.56:8443/internal/reports/2023/quarterly-summary.pdf?session=5f4dcc3b5aa765d61d8327deb882cf99"
+    "&sig=e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855&nonce=9f86d081884c7d659a2feaa0c55ad015"
+    "a3bf4f1b2b0b822cd15d6c15b0f00a08&trace=2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae",
+]
+
+def _near_limit_target(template: str, codec: str = "auto") -> str:
+    """Longest prefix of template which still fits domain length limit"""
+
+    for length in range(len(template), 0, -1):
+        try:
+            encoder.encode(template[:length], 302, MAIN_DOMAIN, codec=codec)
+        except TooLongTarget:
+            continue
+        return template[:length]
+    return ""
+
+NEAR_LIMIT_TARGETS = [_near_limit_target(target, codec) for target in TOO_LONG_TARGETS for codec in encoder.CODECS]
+
+TARGETS = SHORT_TARGETS + METADATA_TARGETS + LONG_PATH_TARGETS + UNICODE_TARGETS + NEAR_LIMIT_TARGETS
+
+DOMAINS = [encoder.encode(target, 302, MAIN_DOMAIN) for target in TARGETS]
@@ -0,0 +1,3 @@
+from r3dir._cli import _cli
+
+_cli()
@@ -1,9 +1,18 @@
-import os, re
-import pyperclip
-import pprint
+import os, re, sys
 import argparse
-import json
-from r3dir.encoder import encode, decode
+from r3dir.encoder import encode, decode, encode_many, decode_many, CODECS
+#other modes import their dependencies lazily, so a single `encode` or `decode` call starts faster
+
+DEFAULT_MAIN_DOMAIN = "r3dir.me"
+
+#`serve` mode options, which are passed to the server as environment variables with the same names in upper case
+SERVER_SETTINGS = ("decode_cache_size", "fast_asgi", "access_log_mode", "access_log_format", "access_log_queue_size",
+                   "access_log_full_policy", "metrics_path", "dns_port", "dns_host", "dns_a", "dns_aaaa", "dns_ttl",
+                   "target_store", "target_store_cache_size", "target_store_negative_ttl", "target_store_path",
+                   "target_store_token",
+                   "hit_log", "hit_log_buffer_size", "hit_log_path", "hit_log_token",
+                   "rate_limit", "rate_limit_burst", "rate_limit_max_clients", "max_concurrency",
+                   "payload_dir", "payload_max_cached_bytes", "payload_max_total_cached_bytes")
 
 hackvertor_tags_folder = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'hackvertor')
 
@@ -63,12 +72,75 @@ def _prepare_hackvertor_tags(main_domain: str):
         tag['code'] = path_to_tag
     return tags
 
+def _read_lines(path: str):
+    """Lazily reads non-empty lines from file or stdin(`-`)"""
+
+    file = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield line
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+def _write_results(results, input_field: str, output_format: str, output=None):
+    """Streams batch encoding/decoding results as JSON lines or CSV rows"""
+
+    import json, csv
+    output = output or sys.stdout
+    fields = [input_field, "result", "error"]
+    if input_field == "domain":
+        fields.insert(2, "status_code")
+    if output_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=fields)
+        writer.writeheader()
+    for item, result, error in results:
+        record = dict.fromkeys(fields)
+        record[input_field], record["result"] = item, result
+        record["error"] = f"{type(error).__name__}: {error}" if error else None
+        if input_field == "domain":
+            record["result"], record["status_code"] = result or (None, None)
+        if output_format == 'csv':
+            writer.writerow(record)
+        else:
+            output.write(json.dumps(record) + "\n")
+
+def _parse_time(value: str) -> float:
+    """UNIX timestamp from a number or ISO 8601 date"""
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    from datetime import datetime
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time: {value}")
+
+def _server_settings(args) -> dict:
+    """Environment variables of the server from `serve` mode options, unset options keep the environment values"""
+
+    settings = {}
+    if args.main_domain:
+        settings["MAIN_DOMAIN"] = args.main_domain
+    for name in SERVER_SETTINGS:
+        value = getattr(args, name)
+        if value is None or value is False or value == []:
+            continue
+        if isinstance(value, list):
+            value = ",".join(value)
+        settings[name.upper()] = "true" if value is True else str(value)
+    return settings
+
 def _cli():
     argParser = argparse.ArgumentParser(description='Encoded/decoder CLI tool for r3dir service')
 
     argParser.add_argument('-d', '--main_domain', type = str,
-                            default = "r3dir.me",
-                            help = f"Domain where r3dir tool is hosted on (default: %(default)s)")
+                            default = None,
+                            help = f"Domain where r3dir tool is hosted on (default: {DEFAULT_MAIN_DOMAIN}, `serve` mode reads MAIN_DOMAIN environment variable)")
     
     subparsers = argParser.add_subparsers(dest='mode', required=True, description="Encoding/decoding mode or Hackvertor tags generation")
 
@@ -76,7 +148,7 @@ def _cli():
 
     https_opts = encoder.add_mutually_exclusive_group()
 
-    encoder.add_argument('target_url', type = str,
+    encoder.add_argument('target_url', type = str, nargs = '?',
                             help = "Target URL which r3dir tool should redirect to")
     encoder.add_argument('-c', '--status_code', type = int,
                             default = 302,
@@ -89,12 +161,134 @@ def _cli():
                             action="store_true")
     encoder.add_argument("--slient_mode", help="Slient mode for automations (e.g Hackvertor tags)",
                             action="store_true")
+    encoder.add_argument('--codec', type = str, choices = ("auto", *CODECS), default = "auto",
+                            help = "Compression codec of the target, `auto` picks the shortest result (default: %(default)s)")
+
+    encoder.add_argument('--index', type = str, default = None, metavar = 'INDEX',
+                            help = "Stream domains of all targets of encoding INDEX(see `index` mode) instead of encoding them")
 
     decoder = subparsers.add_parser('decode', help="r3dir CLI decoder")        
 
-    decoder.add_argument('encoded_domain', type = str,
+    decoder.add_argument('encoded_domain', type = str, nargs = '?',
                             help = "r3dir encoded domain to decode")
+
+    for parser in (encoder, decoder):
+        parser.add_argument('-f', '--from-file', type = str, default = None, metavar = 'FILE',
+                            help = "Read newline-separated inputs from FILE (`-` for stdin) and stream results")
+        parser.add_argument('--format', type = str, choices = ('jsonl', 'csv'), default = 'jsonl',
+                            help = "Output format for --from-file mode (default: %(default)s)")
+        parser.add_argument('-j', '--jobs', type = int, default = 1,
+                            help = "Number of worker processes for --from-file mode (default: %(default)s)")
     
+    indexer = subparsers.add_parser('index', help="Build or update on-disk index of encoded wordlist targets for any domain settings")
+
+    indexer.add_argument('index', type = str,
+                            help = "Index file, existing index is updated and reuses encoded unchanged targets")
+    indexer.add_argument('-f', '--from-file', type = str, required = True, metavar = 'FILE',
+                            help = "Wordlist with newline-separated targets (`-` for stdin)")
+    indexer.add_argument('--codec', type = str, choices = ("auto", *CODECS), default = "auto",
+                            help = "Compression codec of targets, `auto` picks the shortest result (default: %(default)s)")
+
+    permutator = subparsers.add_parser('permute', help="Encode equivalent forms of the target for all status codes and ignore parts")
+
+    permutator.add_argument('target_url', type = str, nargs = '+',
+                            help = "Target URLs (`-` to read newline-separated targets from stdin)")
+    permutator.add_argument('-c', '--status_codes', type = int, nargs = '+', default = [302],
+                            help = "HTTP status codes of redirect responses (default: %(default)s)")
+    permutator.add_argument('-i', '--ignore_parts', type = str, nargs = '+', default = [],
+                            help = "Strings, which will be ignored during decoding. Domains without ignore part are always produced")
+    permutator.add_argument('--schemes', type = str, nargs = '+', default = None,
+                            help = "URL schemes to try instead of the target's one (e.g. http https gopher)")
+    permutator.add_argument("-s", "--https", help="HTTPS enforced encoding(TLS certificate length limitation)",
+                            action="store_true")
+    permutator.add_argument('--codec', type = str, choices = ("auto", *CODECS), default = "auto",
+                            help = "Compression codec of the target, `auto` picks the shortest result (default: %(default)s)")
+    permutator.add_argument('--format', type = str, choices = ('text', 'jsonl'), default = 'text',
+                            help = "Output format: domains only or JSON lines with permutation details (default: %(default)s)")
+
+    registrator = subparsers.add_parser('register', help="Register the target on r3dir server to get its short ID domain")
+
+    registrator.add_argument('target_url', type = str,
+                            help = "Target URL which r3dir tool should redirect to")
+    registrator.add_argument('-c', '--status_code', type = int,
+                            default = 302,
+                            help = f"HTTP status code of a redirect response (default: %(default)s)")
+    registrator.add_argument('-i', '--ignore_part', type = str,
+                            default = None,
+                            help = f"String, which will be ignored during decoding. Used to bypass weak REGEXs")
+    registrator.add_argument('--server_url', type = str, default = None,
+                            help = "Registration URL of the server (default: https://MAIN_DOMAIN/--register/)")
+    registrator.add_argument('--token', type = str, default = os.environ.get("R3DIR_TOKEN"),
+                            help = "Registration token of the server (default: R3DIR_TOKEN environment variable)")
+
+    hits = subparsers.add_parser('hits', help="Query redirects served by r3dir server (SSRF callbacks)")
+
+    hits.add_argument('--host', type = str, default = None,
+                            help = "Encoded host, which was requested")
+    hits.add_argument('--since', type = _parse_time, default = None,
+                            help = "Start of time range, UNIX timestamp or ISO 8601 date")
+    hits.add_argument('--until', type = _parse_time, default = None,
+                            help = "End of time range, UNIX timestamp or ISO 8601 date")
+    hits.add_argument('--limit', type = int, default = 100,
+                            help = "Maximum number of the latest hits (default: %(default)s)")
+    hits.add_argument('--server_url', type = str, default = None,
+                            help = "Hits URL of the server (default: https://MAIN_DOMAIN/--hits/)")
+    hits.add_argument('--token', type = str, default = os.environ.get("R3DIR_TOKEN"),
+                            help = "Hits token of the server (default: R3DIR_TOKEN environment variable)")
+    hits.add_argument('--db', type = str, default = None,
+                            help = "Query local hit log file(HIT_LOG setting) instead of the server")
+
+    server = subparsers.add_parser('serve', help="Run r3dir HTTP server with several worker processes")
+
+    server.add_argument('--host', type = str, default = "0.0.0.0",
+                            help = "Listening address (default: %(default)s)")
+    server.add_argument('--port', type = int, default = 80,
+                            help = "Listening port (default: %(default)s)")
+    server.add_argument('-w', '--workers', type = int, default = 1,
+                            help = "Number of worker processes sharing the port, usually one per CPU core (default: %(default)s)")
+    server.add_argument('--loop', type = str, choices = ('auto', 'asyncio', 'uvloop'), default = 'auto',
+                            help = "Event loop, `auto` uses uvloop if installed (default: %(default)s)")
+    server.add_argument('--http', type = str, choices = ('auto', 'h11', 'httptools'), default = 'auto',
+                            help = "HTTP parser, `auto` uses httptools if installed (default: %(default)s)")
+    server.add_argument('--proxy_headers', action = 'store_true',
+                            help = "Trust X-Forwarded-Proto/X-Forwarded-For headers of a reverse proxy")
+    server.add_argument('--log_level', type = str, choices = ('critical', 'error', 'warning', 'info', 'debug'), default = 'info',
+                            help = "Log level of uvicorn (default: %(default)s)")
+    server_settings = server.add_argument_group('server settings', "Override environment variables of the server, see README")
+    server_settings.add_argument('--decode_cache_size', type = int, help = "DECODE_CACHE_SIZE")
+    server_settings.add_argument('--fast_asgi', action = 'store_true', help = "FAST_ASGI")
+    server_settings.add_argument('--access_log_mode', type = str, choices = ('sync', 'queue'), help = "ACCESS_LOG_MODE")
+    server_settings.add_argument('--access_log_format', type = str, choices = ('text', 'json'), help = "ACCESS_LOG_FORMAT")
+    server_settings.add_argument('--access_log_queue_size', type = int, help = "ACCESS_LOG_QUEUE_SIZE")
+    server_settings.add_argument('--access_log_full_policy', type = str, choices = ('drop', 'block'), help = "ACCESS_LOG_FULL_POLICY")
+    server_settings.add_argument('--metrics_path', type = str, help = "METRICS_PATH")
+    server_settings.add_argument('--dns_port', type = int, help = "DNS_PORT")
+    server_settings.add_argument('--dns_host', type = str, help = "DNS_HOST")
+    server_settings.add_argument('--dns_a', type = str, action = 'append', default = [], help = "DNS_A (can be repeated)")
+    server_settings.add_argument('--dns_aaaa', type = str, action = 'append', default = [], help = "DNS_AAAA (can be repeated)")
+    server_settings.add_argument('--dns_ttl', type = int, help = "DNS_TTL")
+    server_settings.add_argument('--target_store', type = str, help = "TARGET_STORE")
+    server_settings.add_argument('--target_store_cache_size', type = int, help = "TARGET_STORE_CACHE_SIZE")
+    server_settings.add_argument('--target_store_negative_ttl', type = float, help = "TARGET_STORE_NEGATIVE_TTL")
+    server_settings.add_argument('--target_store_path', type = str, help = "TARGET_STORE_PATH")
+    server_settings.add_argument('--target_store_token', type = str, help = "TARGET_STORE_TOKEN")
+    server_settings.add_argument('--hit_log', type = str, help = "HIT_LOG")
+    server_settings.add_argument('--hit_log_buffer_size', type = int, help = "HIT_LOG_BUFFER_SIZE")
+    server_settings.add_argument('--hit_log_path', type = str, help = "HIT_LOG_PATH")
+    server_settings.add_argument('--hit_log_token', type = str, help = "HIT_LOG_TOKEN")
+    server_settings.add_argument('--rate_limit', type = float, help = "RATE_LIMIT")
+    server_settings.add_argument('--rate_limit_burst', type = int, help = "RATE_LIMIT_BURST")
+    server_settings.add_argument('--rate_limit_max_clients', type = int, help = "RATE_LIMIT_MAX_CLIENTS")
+    server_settings.add_argument('--max_concurrency', type = int, help = "MAX_CONCURRENCY")
+    server_settings.add_argument('--payload_dir', type = str, help = "PAYLOAD_DIR")
+    server_settings.add_argument('--payload_max_cached_bytes', type = int, help = "PAYLOAD_MAX_CACHED_BYTES")
+    server_settings.add_argument('--payload_max_total_cached_bytes', type = int, help = "PAYLOAD_MAX_TOTAL_CACHED_BYTES")
+
+    coprocess = subparsers.add_parser('coprocess', help="Answer newline-delimited JSON encode/decode requests without restarting the tool")
+
+    coprocess.add_argument('--socket', type = str, default = None, metavar = 'PATH',
+                            help = "Listen on Unix socket PATH instead of stdin/stdout")
+
     hackvertor = subparsers.add_parser('hackvertor', help="Generate r3dir Hackvertor tags and copy them to clipboard")
 
     hackvertor.add_argument("--print", help="Output Hackvertor tags into terminal",
@@ -102,11 +296,88 @@ def _cli():
 
     args = argParser.parse_args()
 
-    if args.mode == 'encode':
-        print(encode(args.target_url, args.status_code, args.main_domain, args.ignore_part, https_enforced = args.https, slient_mode=args.slient_mode))
+    if args.mode == 'serve':
+        try:
+            from r3dir.server.serve import serve
+        except ImportError as e:
+            server.error(f"server dependencies are not installed({e}), install them with `pip install r3dir[server]`")
+        settings = _server_settings(args)
+        if "MAIN_DOMAIN" not in settings and "MAIN_DOMAIN" not in os.environ:
+            server.error("the server requires main domain: set -d option or MAIN_DOMAIN environment variable")
+        serve(args.host, args.port, args.workers, settings, loop = args.loop, http = args.http,
+              proxy_headers = args.proxy_headers, log_level = args.log_level)
+        return
+    args.main_domain = args.main_domain or DEFAULT_MAIN_DOMAIN
+
+    if args.mode == 'encode' and args.index and (args.target_url or args.from_file):
+        encoder.error("argument --index: not allowed with target_url or --from-file")
+    elif args.mode == 'encode' and args.index:
+        from r3dir.index import EncodingIndex
+        with EncodingIndex(args.index) as index:
+            _write_results(index.domains(args.status_code, args.main_domain, args.ignore_part,
+                                         https_enforced = args.https, slient_mode = args.slient_mode),
+                           "target", args.format)
+    elif args.mode == 'encode' and args.from_file and args.target_url is not None:
+        encoder.error("argument -f/--from-file: not allowed with argument target_url")
+    elif args.mode == 'decode' and args.from_file and args.encoded_domain is not None:
+        decoder.error("argument -f/--from-file: not allowed with argument encoded_domain")
+    elif args.mode == 'encode' and args.from_file:
+        targets = _read_lines(args.from_file)
+        _write_results(encode_many(targets, args.status_code, args.main_domain, args.ignore_part,
+                                   https_enforced = args.https, slient_mode = args.slient_mode, codec = args.codec,
+                                   processes = args.jobs),
+                       "target", args.format)
+    elif args.mode == 'decode' and args.from_file:
+        domains = _read_lines(args.from_file)
+        _write_results(decode_many(domains, args.main_domain, processes = args.jobs), "domain", args.format)
+    elif args.mode == 'encode' and args.target_url is None:
+        encoder.error("the following arguments are required: target_url (or --from-file)")
+    elif args.mode == 'decode' and args.encoded_domain is None:
+        decoder.error("the following arguments are required: encoded_domain (or --from-file)")
+    elif args.mode == 'encode':
+        print(encode(args.target_url, args.status_code, args.main_domain, args.ignore_part, https_enforced = args.https, slient_mode=args.slient_mode, codec=args.codec))
     elif args.mode == 'decode':
         print(decode(args.encoded_domain, args.main_domain))
+    elif args.mode == 'index':
+        from r3dir.index import build_index
+        stats = build_index(_read_lines(args.from_file), args.index, args.codec)
+        print(f"[+] {args.index}: {stats['entries']} targets, {stats['encoded']} encoded, {stats['reused']} reused")
+    elif args.mode == 'permute':
+        import json
+        from r3dir.permutations import permute
+        targets = args.target_url
+        if targets == ['-']:
+            targets = _read_lines('-')
+        permutations = permute(targets, args.status_codes, args.main_domain, [None, *args.ignore_parts],
+                               schemes = args.schemes, https_enforced = args.https, codec = args.codec)
+        for permutation in permutations:
+            if args.format == 'jsonl':
+                print(json.dumps(permutation._asdict()))
+            else:
+                print(permutation.domain)
+    elif args.mode == 'register':
+        from r3dir.client import register
+        print(register(args.target_url, args.status_code, args.main_domain, args.ignore_part,
+                       server_url = args.server_url, token = args.token))
+    elif args.mode == 'hits' and args.db:
+        import json
+        from r3dir.server.hits import connect_readonly, query
+        for hit in query(connect_readonly(args.db), args.host, args.since, args.until, args.limit):
+            print(json.dumps(hit))
+    elif args.mode == 'hits':
+        import json
+        from r3dir.client import query_hits
+        for hit in query_hits(args.main_domain, args.host, args.since, args.until, args.limit,
+                              server_url = args.server_url, token = args.token):
+            print(json.dumps(hit))
+    elif args.mode == 'coprocess':
+        from r3dir.coprocess import serve_stream, serve_socket
+        if args.socket:
+            serve_socket(args.socket, args.main_domain)
+        else:
+            serve_stream(sys.stdin.buffer, sys.stdout.buffer, args.main_domain)
     elif args.mode == 'hackvertor':
+        import json, pprint, pyperclip
         prepared_tags = _prepare_hackvertor_tags(args.main_domain)
         pyperclip.copy(json.dumps(prepared_tags))
         print("[+] Hackvertor tags were copied to a clipboard.")
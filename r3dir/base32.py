@@ -0,0 +1,70 @@
+"""Unpadded lowercase base32(RFC 4648 alphabet) of encoded targets, which are split into DNS labels.
+
+Unlike base64.b32encode/b32decode, there is no padding, case conversion or joining of labels:
+encoding writes characters and label separators into one buffer, decoding converts every label
+with C-level str.translate and int(label, 32) instead of per-character Python loops.
+"""
+import re
+import binascii
+
+ALPHABET = b"abcdefghijklmnopqrstuvwxyz234567"
+#alphabet characters in both cases, as hosts are case insensitive. Explicit ranges instead of
+#re.IGNORECASE, which also matches non-ASCII case variants, e.g. KELVIN SIGN and LATIN SMALL LETTER LONG S
+_LABEL_RE = re.compile("[A-Za-z2-7]*")
+#base32 alphabet -> digits of int(..., 32), which are 0-9a-v
+_DIGITS = str.maketrans("abcdefghijklmnopqrstuvwxyz234567" "ABCDEFGHIJKLMNOPQRSTUVWXYZ",
+                        "0123456789abcdefghijklmnopqrstuv" "0123456789abcdefghijklmnop")
+#every 10-bit value -> two characters
+_PAIRS = [bytes((first, second)) for first in ALPHABET for second in ALPHABET]
+_GROUP_SIZE = 40
+#lengths of unpadded encoding, which stdlib decoder accepts with padding
+_VALID_TAILS = frozenset((0, 2, 4, 5, 7))
+
+
+def encoded_length(size: int) -> int:
+    """Number of base32 characters of `size` bytes without padding"""
+
+    return (size * 8 + 4) // 5
+
+
+def encode_labels(data: bytes | memoryview, prefix: bytes = b"", label_length: int = 63) -> str:
+    """Encodes `prefix` + base32 of `data` and splits the result into labels of `label_length`
+       characters separated with dots"""
+
+    size = len(data)
+    leftover = size % 5
+    if leftover:
+        data = bytes(data) + bytes(5 - leftover)
+    pairs = _PAIRS
+    from_bytes = int.from_bytes
+    encoded = bytearray(prefix)
+    #groups of 40 bytes are converted to one int, so their 32 character pairs are
+    #read with shifts of a small int instead of a loop over every 5 bytes
+    for i in range(0, len(data), _GROUP_SIZE):
+        group = data[i:i + _GROUP_SIZE]
+        c = from_bytes(group, "big")
+        encoded += b"".join([pairs[(c >> shift) & 0x3ff] for shift in range(len(group) * 8 - 10, -1, -10)])
+    del encoded[len(prefix) + encoded_length(size):]
+    #separators are inserted from the end, so positions of the next ones don't move
+    for position in range(len(encoded) - (len(encoded) - 1) % label_length - 1, 0, -label_length):
+        encoded[position:position] = b"."
+    return encoded.decode("ascii")
+
+
+def decode_labels(labels) -> bytes:
+    """Decodes base32 split into labels(any case) without joining them.
+       Raises binascii.Error for characters out of the alphabet and impossible lengths"""
+
+    value = 0
+    length = 0
+    for label in labels:
+        if not label:
+            continue
+        if _LABEL_RE.fullmatch(label) is None:
+            raise binascii.Error("Non-base32 digit found")
+        value = (value << 5 * len(label)) | int(label.translate(_DIGITS), 32)
+        length += len(label)
+    if length % 8 not in _VALID_TAILS:
+        raise binascii.Error("Incorrect padding")
+    #trailing bits of the last character are padding
+    return (value >> length * 5 % 8).to_bytes(length * 5 // 8, "big")
@@ -0,0 +1,47 @@
+import json
+import urllib.parse
+import urllib.request
+import urllib.error
+
+from .encoder import short_id_domain
+from .exceptions import RegistrationError
+
+REGISTER_PATH = "/--register/"
+HITS_PATH = "/--hits/"
+
+
+def register(target: str, status_code: int, main_domain: str, ignore_part: str | None = None,
+             server_url: str | None = None, token: str | None = None, timeout: float = 10) -> str:
+    """Registers the target in the store of r3dir server(TARGET_STORE setting) and returns
+       short ID domain of the target. It's used for targets, which don't fit the domain length limit"""
+
+    url = server_url or f"https://{main_domain}{REGISTER_PATH}"
+    body = json.dumps({"target": target, "status_code": status_code, "ignore_part": ignore_part}).encode("utf-8")
+    result = _request(urllib.request.Request(url, data=body, method="POST", headers={"Content-Type": "application/json"}),
+                      token, timeout)
+
+    domain = short_id_domain(target, status_code, main_domain, ignore_part)
+    if result.get("domain") != domain:
+        raise RegistrationError(f"Server returned unexpected domain {result.get('domain')}, check main domain of the server")
+    return domain
+
+def query_hits(main_domain: str, host: str | None = None, since: float | None = None, until: float | None = None,
+               limit: int = 100, server_url: str | None = None, token: str | None = None, timeout: float = 10) -> list[dict]:
+    """The latest redirects served by r3dir server(HIT_LOG setting) for the encoded host and/or
+       time range(UNIX timestamps)"""
+
+    parameters = {"host": host, "since": since, "until": until, "limit": limit}
+    query = urllib.parse.urlencode({name: value for name, value in parameters.items() if value is not None})
+    url = server_url or f"https://{main_domain}{HITS_PATH}"
+    return _request(urllib.request.Request(f"{url}?{query}"), token, timeout)["hits"]
+
+def _request(request: urllib.request.Request, token: str | None, timeout: float) -> dict:
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        raise RegistrationError(f"{e.code} {e.reason}: {e.read().decode('utf-8', 'replace')}")
+    except (urllib.error.URLError, ValueError) as e:
+        raise RegistrationError(f"Request to {request.full_url} failed: {e}")
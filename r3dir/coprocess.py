@@ -0,0 +1,94 @@
+"""Co-process mode of r3dir CLI. One long-running process answers newline-delimited JSON requests
+on stdin or a Unix socket, so tools, which encode payloads one by one, don't pay interpreter
+start-up and imports for every payload:
+
+    {"id": 1, "op": "encode", "target": "http://localhost", "status_code": 307, "ignore_part": "x"}
+    {"id": 2, "op": "decode", "domain": "x.--.1in3raaa.307.r3dir.me"}
+    -> {"id": 1, "result": "x.--.1in3raaa.307.r3dir.me", "error": null}
+    -> {"id": 2, "result": "http://localhost", "status_code": 307, "error": null}
+
+Encode requests accept `status_code`(302 by default), `ignore_part`, `https`, `slient_mode`, `codec`
+and `main_domain` options, decode requests accept `main_domain`. Responses are written one line
+per request in the order of requests, errors are reported in the `error` field.
+"""
+import os
+import stat
+import json
+import socketserver
+
+from r3dir.encoder import encode, decode, CODECS
+
+
+def handle(line: bytes, main_domain: str) -> dict:
+    """Response to one request line"""
+
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+    except ValueError as e:
+        return {"id": None, "result": None, "error": f"{type(e).__name__}: {e}"}
+
+    op = request.get("op", "encode")
+    response = {"id": request.get("id"), "result": None}
+    if op == "decode":
+        response["status_code"] = None
+    #any failure is reported to the client, so one bad request doesn't stop the co-process
+    try:
+        if op == "encode":
+            codec = request.get("codec", "auto")
+            if codec != "auto" and codec not in CODECS:
+                raise ValueError(f"unknown codec: {codec}")
+            response["result"] = encode(_field(request, "target"), request.get("status_code", 302),
+                                        request.get("main_domain", main_domain), request.get("ignore_part"),
+                                        https_enforced=bool(request.get("https")),
+                                        slient_mode=bool(request.get("slient_mode")), codec=codec)
+        elif op == "decode":
+            response["result"], response["status_code"] = decode(_field(request, "domain"),
+                                                                 request.get("main_domain", main_domain))
+        else:
+            raise ValueError(f"unknown op: {op}")
+    except Exception as e:
+        response["error"] = f"{type(e).__name__}: {e}"
+    else:
+        response["error"] = None
+    return response
+
+
+def _field(request: dict, name: str):
+    if name not in request:
+        raise ValueError(f"missing field: {name}")
+    return request[name]
+
+
+def serve_stream(input, output, main_domain: str):
+    """Answers requests from binary `input` until EOF. Every response is flushed at once,
+       so a client can wait for it before sending the next request"""
+
+    for line in input:
+        if not line.strip():
+            continue
+        output.write(json.dumps(handle(line, main_domain)).encode("UTF-8") + b"\n")
+        output.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        serve_stream(self.rfile, self.wfile, self.server.main_domain)
+
+
+def serve_socket(path: str, main_domain: str):
+    """Answers requests of every connection to Unix socket `path` in a separate thread until interrupted"""
+
+    #socket file of a stopped co-process would fail the bind
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
+    with socketserver.ThreadingUnixStreamServer(path, _Handler) as server:
+        server.main_domain = main_domain
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
@@ -1,86 +1,228 @@
-import math, base64, binascii
+import binascii
+import zlib
+import time
 import unishox2
-import hashlib
+import functools, itertools
+from typing import Iterable, Iterator, NamedTuple
 
-from .exceptions import Base32DecodingError, StatusCodeNotInRangeError, WrongEncodedURLFormat, TooLongTarget
+from . import base32
+from .exceptions import BaseCoderError, Base32DecodingError, StatusCodeNotInRangeError, WrongEncodedURLFormat, TooLongTarget
 
 MAX_DOMAIN_LENGTH = 253
 MAX_SUBDOMAIN_LENGTH = 63
 IGNORE_PART_SEP = "--"
+TOO_LONG_TARGET_PREFIX = "too-long-target-"
+#Domains of targets registered on the server carry SHA-1 prefix of the target instead of the target
+SHORT_ID_PREFIX = "id-"
+SHORT_ID_LENGTH = 16
 MAX_COMPRESSION_TARGET_SIZE = 1024 # we assume that compression rate can't go futher than 85% on usefull links(1024*0.15*8/5=245,76)
 
-def _chunkstring(string: str, length: int) -> tuple[str]:
-    """Helper function, which split string in several chunks not great than indicated lenght"""
+#Common SSRF payload parts for preset dictionary of deflate codec. Deflate references
+#closer parts of the dictionary with shorter codes, so the most frequent ones are at the end
+SSRF_DICTIONARY_V1 = (
+    "/v1/instance/service-accounts/default/token"
+    "/metadata/v1/instance/attributes/ssh-keys"
+    "/computeMetadata/v1/project/project-id"
+    "/openstack/latest/meta_data.json"
+    "/metadata/identity/oauth2/token?api-version=2018-02-01&resource=https://management.azure.com/"
+    "/metadata/instance?api-version=2021-02-01"
+    "http://100.100.100.200/latest/meta-data/"
+    "http://169.254.170.2/v2/credentials/"
+    "https://kubernetes.default.svc/api/v1/namespaces/"
+    "/latest/user-data/latest/dynamic/instance-identity/document"
+    "/latest/api/token"
+    "dict://127.0.0.1:11211/stats"
+    "gopher://127.0.0.1:6379/_INFO%0d%0a"
+    "gopher://127.0.0.1:25/_HELO%20localhost%0d%0a"
+    "%20HTTP/1.1%0d%0aHost:%20%0d%0a%0d%0a"
+    "file:///proc/self/environ"
+    "file:///etc/passwd"
+    "http://[::1]:80/"
+    "http://0.0.0.0:8080/"
+    "http://127.0.0.1:8080/admin/"
+    "http://localhost:80/"
+    "http://metadata.google.internal/computeMetadata/v1/instance/"
+    "http://169.254.169.254/latest/meta-data/iam/security-credentials/"
+).encode("ascii")
 
-    return (string[0+i:length+i] for i in range(0, len(string), length))
+class Codec:
+    """Compression codec of encoded targets. Encoded form of a target starts with codec marker,
+       which is not a base32 character, so decoder dispatches on it. Legacy codec has no marker"""
 
-def _b32encode_dns(string: str) -> tuple:
-    """Base32 encoding of string with Unishox2 compression. Accept string to encode.
-       Returns tuple of chunked encoded data, spllited to be used as subdomains"""
+    marker = ""
 
-    data, _ = unishox2.compress(string)
-    encoded_string = base64.b32encode(data).decode('ascii')
+    def compress(self, string: str) -> bytes:
+        raise NotImplementedError()
+
+    def decompress(self, data: bytes) -> str:
+        raise NotImplementedError()
+
+class Unishox2Codec(Codec):
+    """Unishox2 compression, used by all domains produced before codec markers were introduced"""
+
+    def compress(self, string: str) -> bytes:
+        data, _ = unishox2.compress(string)
+        return data
+
+    def decompress(self, data: bytes) -> str:
+        return unishox2.decompress(data, MAX_COMPRESSION_TARGET_SIZE)
+
+#4KB window holds the dictionary and a target of MAX_COMPRESSION_TARGET_SIZE, so streams are the same as
+#with the default 32KB one, but setting up the compressor is ~6 times cheaper. Decompression doesn't depend on it
+DEFLATE_WBITS = 12
+DEFLATE_MEM_LEVEL = 3
+
+class DeflateCodec(Codec):
+    """Raw deflate of UTF-8 encoded target with preset dictionary"""
+
+    def __init__(self, marker: str, dictionary: bytes):
+        self.marker = marker
+        self.dictionary = dictionary
+        #compressor with loaded dictionary, every target is compressed with its copy
+        self._compressor = zlib.compressobj(9, zlib.DEFLATED, -DEFLATE_WBITS, DEFLATE_MEM_LEVEL,
+                                            zlib.Z_DEFAULT_STRATEGY, dictionary)
+
+    def compress(self, string: str) -> bytes:
+        compressor = self._compressor.copy()
+        return compressor.compress(string.encode("utf-8")) + compressor.flush()
+
+    def decompress(self, data: bytes) -> str:
+        decompressor = zlib.decompressobj(-15, zdict=self.dictionary)
+        decompressed_data = decompressor.decompress(data, MAX_COMPRESSION_TARGET_SIZE)
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            raise zlib.error("Truncated or too large deflate stream")
+        return decompressed_data.decode("utf-8")
+
+LEGACY_CODEC = Unishox2Codec()
+
+CODECS = {
+    "unishox2": LEGACY_CODEC,
+    "deflate": DeflateCodec("1", SSRF_DICTIONARY_V1),
+}
+#Markers are characters out of base32 alphabet
+CODEC_MARKER_CHARS = "0189"
+CODEC_MARKERS = {codec.marker: codec for codec in CODECS.values() if codec.marker}
+
+#Errors of base32 decoding and decompression, which mean malformed encoded target
+DECODING_ERRORS = (UnicodeDecodeError, binascii.Error, zlib.error)
+
+def _b32encode_labels(string: str, codec: str = "auto") -> str:
+    """Base32 encoding of string with compression. Accept string to encode and codec name,
+       `auto` picks codec with the shortest result. Returns encoded data split into
+       subdomains with dots"""
+
+    codecs = CODECS.values() if codec == "auto" else (CODECS[codec],)
+
+    #length of the result is known from the compressed size, so only the shortest one is encoded
+    candidates = ((candidate, candidate.compress(string)) for candidate in codecs)
+    shortest, data = min(candidates, key=lambda candidate: len(candidate[0].marker) + base32.encoded_length(len(candidate[1])))
 
-    #stripping '=' to save characters in subdomains
-    encoded_string = encoded_string.rstrip("=").lower()
     #splitting in chunks due to subdomain length limitations
-    subdomains = _chunkstring(encoded_string, MAX_SUBDOMAIN_LENGTH)
-    return tuple(subdomains)
+    return base32.encode_labels(data, shortest.marker.encode("ascii"), MAX_SUBDOMAIN_LENGTH)
+
+def _b32encode_dns(string: str, codec: str = "auto") -> tuple:
+    """Tuple of encoded subdomains of string, see _b32encode_labels()"""
+
+    subdomains = _b32encode_labels(string, codec)
+    return tuple(subdomains.split(".")) if subdomains else ()
+
+def _b32decode_raw(subdomains: tuple | list) -> tuple[Codec, bytes]:
+    """Base32 decoding of chunked subdomains without decompression.
+       Returns codec of the encoded target and compressed data"""
+
+    if subdomains and not subdomains[0]:
+        #marker is the first character of encoded target, empty subdomains don't count
+        subdomains = [subdomain for subdomain in subdomains if subdomain]
+
+    codec = LEGACY_CODEC
+    if subdomains and subdomains[0][0] in CODEC_MARKER_CHARS:
+        try:
+            codec = CODEC_MARKERS[subdomains[0][0]]
+        except KeyError:
+            raise binascii.Error("Unknown codec marker")
+        subdomains = (subdomains[0][1:], *subdomains[1:])
+
+    return codec, base32.decode_labels(subdomains)
 
 def _b32decode_dns(subdomains: tuple | list) -> str:
-    """Base32 decoding with unishox2 compression. Accept tuple of subdomains,
+    """Base32 decoding with decompression. Accept tuple of subdomains,
        containing encoded string. Returns decoded and decompresed string"""
-    
-    encoded_string = "".join(subdomains)
-
-    #padding Base32 for error-less decoding
-    pad_length = math.ceil(len(encoded_string) / 8) * 8 - len(encoded_string)
-    encoded_target = encoded_string + "=" * pad_length
 
-    decoded_data = base64.b32decode(encoded_target, casefold = True)
-    decompresed_data = unishox2.decompress(decoded_data, MAX_COMPRESSION_TARGET_SIZE)
-    return decompresed_data
+    codec, data = _b32decode_raw(subdomains)
+    return codec.decompress(data)
 
 def _is_too_long_target_error(encoded_subdomains: tuple | list):
     """Detects targets, which was too long to encode but tool was used in """
     for domain in encoded_subdomains:
-        if domain.startswith("too-long-target-"):
-            target_url_hash = domain.replace("too-long-target-", "") 
+        if domain.startswith(TOO_LONG_TARGET_PREFIX):
+            target_url_hash = domain.replace(TOO_LONG_TARGET_PREFIX, "") 
             return target_url_hash
     return False
 
+def _is_short_id(encoded_subdomains: tuple | list):
+    """Detects short ID of the target registered on the server"""
+    if encoded_subdomains and encoded_subdomains[0].startswith(SHORT_ID_PREFIX):
+        return encoded_subdomains[0][len(SHORT_ID_PREFIX):]
+    return False
+
+def _assemble_domain(subdomains: str, status_code: int, main_domain: str,
+                     ignore_part: str | None = None, https_enforced: bool = False) -> str:
+    """Builds encoded domain from already encoded target subdomains. Raises TooLongTarget
+       if the domain doesn't correspond to limitations of DNS and TLS certificates"""
+
+    encoded_domain = f"{subdomains}.{status_code}.{main_domain}"
+
+    if https_enforced:
+        if ignore_part or len(subdomains) > MAX_SUBDOMAIN_LENGTH:
+            raise TooLongTarget(f"The target length is longer than maximum allowed for HTTPS mode. Remove ignoring part, or short the target.")
+    elif ignore_part:
+        encoded_domain = f"{ignore_part}.{IGNORE_PART_SEP}.{encoded_domain}"
+
+    if len(encoded_domain) > MAX_DOMAIN_LENGTH:
+        raise TooLongTarget(f"The target length is longer than maximum allowed. Remove ignoring part or short the target.")
+    return encoded_domain
+
+def _error_domain(target: str, status_code: int, main_domain: str) -> str:
+    """Error domain of silent mode with SHA-1 hash of too long target"""
+
+    return f"{TOO_LONG_TARGET_PREFIX}{_target_hash(target)}.{status_code}.{main_domain}"
+
+def _target_hash(target: str) -> str:
+    #hashlib is slow to import and only too long targets need it
+    import hashlib
+    return hashlib.sha1(target.encode("UTF-8")).hexdigest()
+
+def short_id(target: str) -> str:
+    """Short ID of the target, which is used as a key on the server"""
+
+    return _target_hash(target)[:SHORT_ID_LENGTH]
+
+def short_id_domain(target: str, status_code: int, main_domain: str, ignore_part: str | None = None) -> str:
+    """Domain of the target registered on the server. The domain fits HTTPS limitations
+       for any target, ignoring part is allowed only without HTTPS"""
+
+    return _assemble_domain(f"{SHORT_ID_PREFIX}{short_id(target)}", status_code, main_domain, ignore_part)
+
 def encode(target: str, status_code: int, main_domain: str, 
-            ignore_part: str | None = None, https_enforced: bool = False, slient_mode: bool = False) -> str:
+            ignore_part: str | None = None, https_enforced: bool = False, slient_mode: bool = False,
+            codec: str = "auto") -> str:
     """"r3dir encoder method. Accepts redirection target, status code of redirect
         and main_domain of used redirection server. Returns domain with encoded target.
         For optional parameters description, reference CLI tool help."""
 
-    subdomains = ".".join(_b32encode_dns(target))
-    
-    encoded_domain = f"{subdomains}.{status_code}.{main_domain}"
+    subdomains = _b32encode_labels(target, codec)
 
     #check whether encoded domain length corresponds to limitations of DNS and TLS certificates
     try:
-        if https_enforced:
-            if ignore_part or len(subdomains) > MAX_SUBDOMAIN_LENGTH:
-                raise TooLongTarget(f"The target length is longer than maximum allowed for HTTPS mode. Remove ignoring part, or short the target.")
-        elif ignore_part:
-            encoded_domain = f"{ignore_part}.{IGNORE_PART_SEP}.{encoded_domain}"
-
-        if len(encoded_domain) > MAX_DOMAIN_LENGTH:
-            raise TooLongTarget(f"The target length is longer than maximum allowed. Remove ignoring part or short the target.")
+        return _assemble_domain(subdomains, status_code, main_domain, ignore_part, https_enforced)
     except TooLongTarget:
         if not slient_mode:
             raise
-        target_hash = hashlib.sha1(target.encode("UTF-8")).hexdigest()
-        error_domain = f"too-long-target-{target_hash}.{status_code}.{main_domain}"
-        return error_domain
-    
-    return encoded_domain
+        return _error_domain(target, status_code, main_domain)
 
-def decode(domain: str, main_domain: str) -> tuple[str, int]:
-    """"r3dir decoder method. Accepts encoded domain and main domain of the redirection server.
-        Returns redirection target and status code for redirect responce"""
+def _parse_domain(domain: str, main_domain: str) -> tuple[list, int]:
+    """Splits encoded domain into subdomains of encoded target and status code.
+       Raises the same format errors as decode()"""
 
     subdomains = domain.split('.')
 
@@ -95,19 +237,109 @@ def decode(domain: str, main_domain: str) -> tuple[str, int]:
     encoded_subdomains = subdomains_without_main[start_of_encoded_target:]
 
     if target_url_hash := _is_too_long_target_error(encoded_subdomains):
-        raise TooLongTarget(f"The target length has been too long for encoder. Target's SHA-1: {target_url_hash}")
+        raise TooLongTarget(f"The target length has been too long for encoder. Target's SHA-1: {target_url_hash}",
+                            target_hash=target_url_hash, status_code=_stored_status_code(encoded_subdomains))
+    if target_url_hash := _is_short_id(encoded_subdomains):
+        raise TooLongTarget(f"The target has been registered on the server. Target's short ID: {target_url_hash}",
+                            target_hash=target_url_hash, status_code=_stored_status_code(encoded_subdomains))
+
+    return encoded_subdomains[:-1], _read_status_code(encoded_subdomains)
 
+def _read_status_code(encoded_subdomains: list) -> int:
     try:
         status_code = int(encoded_subdomains[-1])
     except (IndexError, ValueError) as e:
         raise WrongEncodedURLFormat("Can't read status code.")
     if status_code not in range(200, 600):
         raise StatusCodeNotInRangeError("Status code is not in [200, 600) range")
-    
+    return status_code
+
+def _stored_status_code(encoded_subdomains: list) -> int | None:
+    """Status code of error and short ID domains, which have only the hash before it"""
+
+    if len(encoded_subdomains) != 2:
+        return None
     try:
-        target = _b32decode_dns(encoded_subdomains[:-1])
-    except (UnicodeDecodeError, binascii.Error) as e:
+        return _read_status_code(encoded_subdomains)
+    except WrongEncodedURLFormat:
+        return None
+
+def decode(domain: str, main_domain: str, observe=None) -> tuple[str, int]:
+    """"r3dir decoder method. Accepts encoded domain and main domain of the redirection server.
+        Returns redirection target and status code for redirect responce.
+        Optional `observe(stage, seconds)` callback gets time of `parse`, `base32` and `decompress` stages"""
+
+    if observe is not None:
+        start = time.perf_counter()
+    encoded_subdomains, status_code = _parse_domain(domain, main_domain)
+    if observe is not None:
+        parsed = time.perf_counter()
+        observe("parse", parsed - start)
+
+    try:
+        codec, data = _b32decode_raw(encoded_subdomains)
+        if observe is not None:
+            decoded = time.perf_counter()
+            observe("base32", decoded - parsed)
+        target = codec.decompress(data)
+        if observe is not None:
+            observe("decompress", time.perf_counter() - decoded)
+    except DECODING_ERRORS as e:
         raise Base32DecodingError("Base32-encoded target decoding error")
-    
+
     return target, status_code
 
+
+class CodingResult(NamedTuple):
+    """Result of one item of batch encoding/decoding. `result` is encoded domain for
+       encode_many() or (target, status_code) tuple for decode_many(). If the item
+       failed, `result` is None and `error` contains the raised r3dir exception"""
+    item: str
+    result: str | tuple[str, int] | None
+    error: BaseCoderError | None = None
+
+def _encode_item(target: str, **kwargs) -> CodingResult:
+    try:
+        return CodingResult(target, encode(target, **kwargs))
+    except BaseCoderError as e:
+        return CodingResult(target, None, e)
+
+def _decode_item(domain: str, **kwargs) -> CodingResult:
+    try:
+        return CodingResult(domain, decode(domain, **kwargs))
+    except BaseCoderError as e:
+        return CodingResult(domain, None, e)
+
+def _map_items(func, items: Iterable[str], processes: int | None, chunksize: int) -> Iterator[CodingResult]:
+    """Lazily applies func to items. With processes set, items are handled by a process pool
+       in bounded batches, so memory usage doesn't depend on the input size"""
+
+    if not processes or processes <= 1:
+        yield from map(func, items)
+        return
+
+    import multiprocessing
+    items = iter(items)
+    with multiprocessing.Pool(processes) as pool:
+        while batch := list(itertools.islice(items, processes * chunksize)):
+            yield from pool.imap(func, batch, chunksize)
+
+def encode_many(targets: Iterable[str], status_code: int, main_domain: str,
+                ignore_part: str | None = None, https_enforced: bool = False, slient_mode: bool = False,
+                codec: str = "auto", processes: int | None = None, chunksize: int = 256) -> Iterator[CodingResult]:
+    """Streaming version of encode(). Accepts iterable of targets and yields CodingResult
+       for each of them in the same order. Errors are reported per item instead of being raised.
+       Set `processes` to encode large inputs in a process pool"""
+
+    func = functools.partial(_encode_item, status_code=status_code, main_domain=main_domain,
+                             ignore_part=ignore_part, https_enforced=https_enforced, slient_mode=slient_mode, codec=codec)
+    return _map_items(func, targets, processes, chunksize)
+
+def decode_many(domains: Iterable[str], main_domain: str,
+                processes: int | None = None, chunksize: int = 256) -> Iterator[CodingResult]:
+    """Streaming version of decode(). Accepts iterable of encoded domains and yields CodingResult
+       for each of them in the same order. Errors are reported per item instead of being raised.
+       Set `processes` to decode large inputs in a process pool"""
+
+    func = functools.partial(_decode_item, main_domain=main_domain)
+    return _map_items(func, domains, processes, chunksize)
@@ -4,6 +4,12 @@ class BaseCoderError(Exception):
 class TooLongTarget(BaseCoderError):
     """Too long target to encode via domain-based redirection"""
 
+    def __init__(self, *args, target_hash: str | None = None, status_code: int | None = None):
+        super().__init__(*args)
+        #SHA-1 or short ID of the target and status code of error and short ID domains
+        self.target_hash = target_hash
+        self.status_code = status_code
+
 class WrongEncodedURLFormat(BaseCoderError):
     """Wrong format of domain to decode"""
 
@@ -11,4 +17,8 @@ class Base32DecodingError(WrongEncodedURLFormat):
     """Base32-encoded target decoding error"""
 
 class StatusCodeNotInRangeError(WrongEncodedURLFormat):
-    """Status code is not in [200, 600) range"""
\ No newline at end of file
+    """Status code is not in [200, 600) range"""
+
+
+class RegistrationError(BaseCoderError):
+    """Request to r3dir server(target registration or hits query) failed"""
@@ -1630,6 +1630,8 @@ function base32Decode (input, variant) {
 const MAX_SUBDOMAIN_LENGTH = 63;
 const IGNORE_PART_SEP = "--";
 const MAX_DOMAIN_LENGTH = 253
+// Codec markers of r3dir encoder, "1" is raw deflate with a preset dictionary. Only Unishox2(no marker) is supported here
+const CODEC_MARKER_CHARS = "0189";
 
 function chunkString(string, length) {
     const chunks = [];
@@ -1719,6 +1721,11 @@ function decode(domain, mainDomain) {
         throw new Error("Status code is not in [200, 600) range");
     }
 
+    const encodedTarget = encodedSubdomains.slice(0, -1).join('');
+    if (encodedTarget && CODEC_MARKER_CHARS.includes(encodedTarget[0])) {
+        throw new Error(`Unsupported codec marker '${encodedTarget[0]}': decode the domain with r3dir CLI tool`);
+    }
+
     try {
         const target = b32decodeDns(encodedSubdomains.slice(0, -1));
         return [target, statusCode];
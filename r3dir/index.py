@@ -0,0 +1,152 @@
+"""On-disk index of encoded wordlists. Compressed base32 form of a target doesn't depend on main
+domain, status code or ignore part, so the index keeps it once and domains of any combination
+are produced with string assembly only.
+
+File layout(little-endian), the file is memory-mapped and read without copying:
+
+    header   magic, codec name, number of entries
+    entries  (key, offset, target length, subdomains length) in wordlist order
+    keys     (key, entry number) sorted by key, binary search of a target
+    data     target and encoded subdomains of every entry, UTF-8/ASCII
+
+Key is the first 8 bytes of target's SHA-1. Rebuilding the index for a changed wordlist reuses
+entries of unchanged targets, so only new targets are compressed.
+"""
+import os
+import mmap
+import struct
+import hashlib
+from typing import Iterable, Iterator
+
+from .encoder import _b32encode_labels, _assemble_domain, _error_domain, CodingResult
+from .exceptions import TooLongTarget
+
+MAGIC = b"R3DIDX1\0"
+HEADER = struct.Struct("<8s16sQ")
+ENTRY = struct.Struct("<QQII")
+KEY = struct.Struct("<QQ")
+
+
+def _key(target_bytes: bytes) -> int:
+    return int.from_bytes(hashlib.sha1(target_bytes).digest()[:8], "little")
+
+
+class EncodingIndex:
+    """Read-only memory-mapped index. Opening doesn't read entries, so large indexes open at once"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size or self._mmap[:len(MAGIC)] != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} isn't r3dir encoding index")
+        _, codec, self._count = HEADER.unpack_from(self._mmap, 0)
+        self.codec = codec.rstrip(b"\0").decode("ascii")
+        self._keys_offset = HEADER.size + self._count * ENTRY.size
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, number: int) -> tuple[bytes, str]:
+        _, offset, target_length, subdomains_length = ENTRY.unpack_from(self._mmap, HEADER.size + number * ENTRY.size)
+        target_end = offset + target_length
+        return self._mmap[offset:target_end], self._mmap[target_end:target_end + subdomains_length].decode("ascii")
+
+    def lookup(self, target: str) -> str | None:
+        """Encoded subdomains of the target or None if it isn't indexed"""
+
+        target_bytes = target.encode("UTF-8")
+        key = _key(target_bytes)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            middle_key, number = KEY.unpack_from(self._mmap, self._keys_offset + middle * KEY.size)
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                indexed_target, subdomains = self._entry(number)
+                #different targets with the same key are not expected, but they mustn't get a wrong payload
+                return subdomains if indexed_target == target_bytes else None
+        return None
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        """(target, subdomains) pairs in wordlist order"""
+
+        for number in range(self._count):
+            target, subdomains = self._entry(number)
+            yield target.decode("UTF-8"), subdomains
+
+    def domains(self, status_code: int, main_domain: str, ignore_part: str | None = None,
+                https_enforced: bool = False, slient_mode: bool = False) -> Iterator[CodingResult]:
+        """Same results as encode_many() over the indexed wordlist, without compression and base32"""
+
+        for target, subdomains in self:
+            try:
+                yield CodingResult(target, _assemble_domain(subdomains, status_code, main_domain, ignore_part, https_enforced))
+            except TooLongTarget as e:
+                if slient_mode:
+                    yield CodingResult(target, _error_domain(target, status_code, main_domain))
+                else:
+                    yield CodingResult(target, None, e)
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def build_index(targets: Iterable[str], path: str, codec: str = "auto") -> dict:
+    """Writes index of targets to `path`. Encoded subdomains of targets, which are in the existing
+       index of the same codec, are reused. Returns numbers of written, reused and encoded entries"""
+
+    previous = None
+    if os.path.exists(path):
+        previous = EncodingIndex(path)
+        if previous.codec != codec:
+            previous.close()
+            previous = None
+
+    entries, keys, data = [], [], bytearray()
+    seen = set()
+    reused = 0
+    try:
+        for target in targets:
+            target_bytes = target.encode("UTF-8")
+            if target_bytes in seen:
+                continue
+            seen.add(target_bytes)
+            key = _key(target_bytes)
+            subdomains = previous.lookup(target) if previous is not None else None
+            if subdomains is None:
+                subdomains = _b32encode_labels(target, codec)
+            else:
+                reused += 1
+            subdomains = subdomains.encode("ascii")
+            keys.append((key, len(entries)))
+            entries.append((key, len(data), len(target_bytes), len(subdomains)))
+            data += target_bytes
+            data += subdomains
+    finally:
+        if previous is not None:
+            previous.close()
+
+    keys.sort()
+    data_offset = HEADER.size + len(entries) * (ENTRY.size + KEY.size)
+    #temporary file and rename, so readers never see a partially written index
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, codec.encode("ascii"), len(entries)))
+        for key, offset, target_length, subdomains_length in entries:
+            file.write(ENTRY.pack(key, data_offset + offset, target_length, subdomains_length))
+        for key_entry in keys:
+            file.write(KEY.pack(*key_entry))
+        file.write(data)
+    os.replace(temporary_path, path)
+    return {"entries": len(entries), "reused": reused, "encoded": len(entries) - reused}
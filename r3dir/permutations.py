@@ -0,0 +1,143 @@
+import ipaddress
+import itertools
+from collections import OrderedDict
+from typing import Iterable, Iterator, NamedTuple
+from urllib.parse import urlsplit, urlunsplit
+
+from . import base32
+from .encoder import _b32encode_labels, _assemble_domain, _error_domain, MAX_DOMAIN_LENGTH, MAX_SUBDOMAIN_LENGTH, MAX_COMPRESSION_TARGET_SIZE, IGNORE_PART_SEP
+from .exceptions import TooLongTarget
+
+#any target, even an empty one, is compressed to at least one byte
+SHORTEST_ENCODED_LENGTH = base32.encoded_length(1)
+
+class Permutation(NamedTuple):
+    """One encoded form of a permuted target"""
+    target: str
+    status_code: int
+    ignore_part: str | None
+    domain: str
+
+
+def ipv4_variants(address: ipaddress.IPv4Address) -> Iterator[str]:
+    """Equivalent notations of IPv4 address, which are accepted by common URL parsers"""
+
+    octets = address.packed
+    number = int(address)
+    yield str(address)
+    #integer forms
+    yield str(number)
+    yield hex(number)
+    yield "0" + format(number, "o")
+    #per-octet forms
+    yield ".".join(hex(octet) for octet in octets)
+    yield ".".join("0" + format(octet, "o") for octet in octets)
+    #short forms, last part fills the rest of the address
+    yield f"{octets[0]}.{octets[1]}.{int.from_bytes(octets[2:], 'big')}"
+    yield f"{octets[0]}.{int.from_bytes(octets[1:], 'big')}"
+    #IPv4-mapped IPv6
+    yield f"[::ffff:{address}]"
+    yield f"[::ffff:{number >> 16:x}:{number & 0xffff:x}]"
+    yield f"[0:0:0:0:0:ffff:{address}]"
+
+def ipv6_variants(address: ipaddress.IPv6Address) -> Iterator[str]:
+    """Compressed and exploded forms of IPv6 address, IPv4-mapped ones are expanded as IPv4"""
+
+    yield f"[{address.compressed}]"
+    yield f"[{address.exploded}]"
+    if address.ipv4_mapped:
+        yield from ipv4_variants(address.ipv4_mapped)
+
+def host_variants(host: str) -> Iterator[str]:
+    """Equivalent forms of URL host. Hostnames are kept as is"""
+
+    try:
+        address = ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        yield host
+        return
+    if address.version == 4:
+        yield from ipv4_variants(address)
+    else:
+        yield from ipv6_variants(address)
+
+def target_variants(target: str, schemes: Iterable[str] | None = None) -> Iterator[str]:
+    """Lazily expands target across alternate schemes and IP address notations"""
+
+    url = urlsplit(target)
+    schemes = schemes or (url.scheme,)
+    try:
+        port = f":{url.port}" if url.port is not None else ""
+        hosts = list(host_variants(url.hostname)) if url.hostname else []
+    except ValueError:
+        #malformed port or address(e.g. IPv6 zone ID), which can't be rewritten
+        hosts = []
+    if not hosts:
+        #netloc is kept as is, only schemes are expanded
+        for scheme in schemes:
+            yield urlunsplit(url._replace(scheme=scheme))
+        return
+    userinfo = url.netloc.rpartition("@")[0]
+    for host in hosts:
+        netloc = f"{userinfo}@{host}{port}" if userinfo else f"{host}{port}"
+        for scheme in schemes:
+            yield urlunsplit(url._replace(scheme=scheme, netloc=netloc))
+
+def _deduplicate(items: Iterable[str], window: int) -> Iterator[str]:
+    """Skips repeated items. Memory is bounded: only last `window` unique items are remembered"""
+
+    seen = OrderedDict()
+    for item in items:
+        if item in seen:
+            seen.move_to_end(item)
+            continue
+        seen[item] = None
+        if len(seen) > window:
+            seen.popitem(last=False)
+        yield item
+
+def _capacity(status_code: int, main_domain: str, ignore_part: str | None, https_enforced: bool) -> int:
+    """Maximum length of encoded target subdomains, which fits the combination"""
+
+    if https_enforced:
+        return -1 if ignore_part else MAX_SUBDOMAIN_LENGTH
+    overhead = len(f".{status_code}.{main_domain}")
+    if ignore_part:
+        overhead += len(f"{ignore_part}.{IGNORE_PART_SEP}.")
+    return MAX_DOMAIN_LENGTH - overhead
+
+def permute(targets: Iterable[str], status_codes: Iterable[int], main_domain: str,
+            ignore_parts: Iterable[str | None] = (None,), schemes: Iterable[str] | None = None,
+            https_enforced: bool = False, slient_mode: bool = False, codec: str = "auto",
+            dedup_window: int = 65536) -> Iterator[Permutation]:
+    """Lazily expands targets across schemes, IP address notations, status codes and ignore parts
+       and streams encoded domains. Every unique target is compressed once for all combinations.
+       Too long combinations are skipped(error domains are yielded in silent mode), targets, which
+       can't be decoded by the server or can't fit any combination, aren't compressed at all"""
+
+    status_codes = tuple(status_codes)
+    ignore_parts = tuple(ignore_parts)
+    schemes = tuple(schemes) if schemes else None
+
+    #combinations, which can't fit even the shortest encoded target, are too long for any target
+    combinations = [(code, part, _capacity(code, main_domain, part, https_enforced) >= SHORTEST_ENCODED_LENGTH)
+                     for code in status_codes for part in ignore_parts]
+    fits = any(fit for _, _, fit in combinations)
+
+    variants = itertools.chain.from_iterable(target_variants(target, schemes) for target in targets)
+    for target in _deduplicate(variants, dedup_window):
+        subdomains = None
+        #server doesn't decompress targets longer than MAX_COMPRESSION_TARGET_SIZE
+        if fits and len(target.encode("UTF-8")) <= MAX_COMPRESSION_TARGET_SIZE:
+            subdomains = _b32encode_labels(target, codec)
+
+        for status_code, ignore_part, fit in combinations:
+            try:
+                if subdomains is None or not fit:
+                    raise TooLongTarget("The target length is longer than maximum allowed.")
+                domain = _assemble_domain(subdomains, status_code, main_domain, ignore_part, https_enforced)
+            except TooLongTarget:
+                if not slient_mode:
+                    continue
+                domain = _error_domain(target, status_code, main_domain)
+            yield Permutation(target, status_code, ignore_part, domain)
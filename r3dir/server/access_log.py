@@ -0,0 +1,133 @@
+import sys, json, time
+import queue, threading
+import asyncio
+from datetime import datetime
+
+from loguru import logger
+
+LOG_MODES = ("sync", "queue")
+LOG_FORMATS = ("text", "json")
+FULL_QUEUE_POLICIES = ("drop", "block")
+
+_STOP = object()
+
+
+class AccessLog:
+    """Access log of served redirects. In `sync` mode records are written via loguru
+       inside the request. In `queue` mode the request only enqueues a raw record into
+       a bounded queue and a background thread formats and writes records in batches.
+       When the queue is full, records are dropped or the request waits for free space.
+       Requests of the server use log_async(), so a waiting request doesn't block the event loop"""
+
+    def __init__(self, mode: str = "sync", output_format: str = "text", queue_size: int = 10000,
+                 full_policy: str = "drop", batch_size: int = 512, stream=None):
+        if mode not in LOG_MODES:
+            raise ValueError(f"Access log mode should be one of {LOG_MODES}")
+        if output_format not in LOG_FORMATS:
+            raise ValueError(f"Access log format should be one of {LOG_FORMATS}")
+        if full_policy not in FULL_QUEUE_POLICIES:
+            raise ValueError(f"Access log full queue policy should be one of {FULL_QUEUE_POLICIES}")
+
+        self.mode = mode
+        self.output_format = output_format
+        self.full_policy = full_policy
+        self.batch_size = batch_size
+        self.stream = stream
+        self.written = 0
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._queue = queue.Queue(queue_size)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def log(self, url, target: str, status_code: int):
+        """Records served redirect. With `block` policy the calling thread waits for free space"""
+
+        if self.mode == "sync":
+            logger.success(f"{url} -> {target, status_code}")
+            return
+
+        if self._thread is None:
+            self._start()
+        record = (time.time(), url, target, status_code)
+        if self.full_policy == "block":
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    async def log_async(self, url, target: str, status_code: int):
+        """log() for the event loop. With `block` policy a full queue is waited for in
+           an executor thread, so other requests of the worker are served meanwhile"""
+
+        if self.mode == "sync" or self.full_policy == "drop":
+            self.log(url, target, status_code)
+            return
+
+        if self._thread is None:
+            self._start()
+        record = (time.time(), url, target, status_code)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self._queue.put, record)
+
+    def close(self):
+        """Flushes queued records and stops the background thread"""
+
+        with self._thread_lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "queued": self._queue.qsize(),
+                "written": self.written, "dropped": self.dropped}
+
+    def _start(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="r3dir-access-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if _STOP in batch:
+                stop = True
+                batch = batch[:batch.index(_STOP)]
+            self._write(batch)
+
+    def _write(self, batch: list):
+        lines = [self._format(*record) for record in batch]
+
+        dropped = self.dropped
+        if dropped != self._reported_dropped:
+            if self.output_format == "json":
+                lines.append(json.dumps({"level": "WARNING", "dropped": dropped}))
+            else:
+                lines.append(f"WARNING:  {dropped - self._reported_dropped} access log records were dropped ({dropped} in total)")
+            self._reported_dropped = dropped
+
+        if not lines:
+            return
+        stream = self.stream or sys.stdout
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+        self.written += len(batch)
+
+    def _format(self, timestamp: float, url, target: str, status_code: int) -> str:
+        record_time = datetime.fromtimestamp(timestamp).astimezone().isoformat()
+        if self.output_format == "json":
+            return json.dumps({"time": record_time, "url": str(url), "target": target, "status_code": status_code})
+        return f"SUCCESS:  {url} -> {target, status_code} | {record_time}"
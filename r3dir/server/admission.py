@@ -0,0 +1,109 @@
+"""Admission control of r3dir server: per-client rate limits and a cap of concurrent requests.
+
+Rejected requests get short 429/503 responses before routing and decoding, so a noisy
+client costs one dictionary lookup per request. Limits are enforced by every worker process.
+"""
+import math
+import time
+
+TEXT_PLAIN = (b"content-type", b"text/plain; charset=utf-8")
+
+
+class RateLimiter:
+    """Per-client token buckets. Every bucket is stored as one float, the time when the bucket
+       becomes full again(generic cell rate algorithm), so a request costs a dictionary lookup
+       and a few float operations.
+
+       Buckets live in two generations, which rotate every `burst / rate` seconds. A bucket,
+       which wasn't used for the whole generation, is full anyway, so the oldest generation is
+       dropped without losing state. If the current generation exceeds `max_clients`, it's rotated
+       earlier, so memory is bounded under floods from many addresses"""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 65536, clock=time.monotonic):
+        self.interval = 1 / rate
+        #how far the bucket can be ahead of time while still having a token(with slack for float rounding)
+        self.tolerance = (burst - 1) * self.interval + 1e-9
+        self.window = burst * self.interval
+        self.max_clients = max_clients
+        self.clock = clock
+        self.current = {}
+        self.previous = {}
+        self.rotated = clock()
+        self.evicted = 0
+
+    def acquire(self, client: str) -> float:
+        """Takes a token of the client. Returns 0 on success or seconds until the next token"""
+
+        now = self.clock()
+        if now - self.rotated >= self.window or len(self.current) >= self.max_clients:
+            self._rotate(now)
+
+        full_at = self.current.get(client)
+        if full_at is None:
+            full_at = self.previous.pop(client, now)
+        full_at = max(full_at, now)
+        if full_at - now > self.tolerance:
+            self.current[client] = full_at
+            return full_at - now - self.tolerance
+        self.current[client] = full_at + self.interval
+        return 0
+
+    def _rotate(self, now: float):
+        if now - self.rotated < self.window:
+            #early rotation drops buckets, which aren't full yet
+            self.evicted += len(self.previous)
+        self.previous = self.current
+        self.current = {}
+        self.rotated = now
+
+    def __len__(self):
+        return len(self.current) + len(self.previous)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware, which rejects requests over the client rate limit with 429 and
+       requests over `max_concurrency` in-flight requests of the worker with 503 instead of queueing them"""
+
+    def __init__(self, app, rate_limiter: RateLimiter | None = None, max_concurrency: int = 0):
+        self.app = app
+        self.rate_limiter = rate_limiter
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.rate_limiter is not None:
+            client = scope.get("client")
+            wait = self.rate_limiter.acquire(client[0] if client else "")
+            if wait:
+                self.rate_limited += 1
+                await _reject(send, 429, b"Too Many Requests", math.ceil(wait))
+                return
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            self.overloaded += 1
+            await _reject(send, 503, b"Service Unavailable", 1)
+            return
+
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "admitted": self.admitted,
+                "rate_limited": self.rate_limited, "overloaded": self.overloaded}
+
+
+async def _reject(send, status_code: int, body: bytes, retry_after: int):
+    await send({"type": "http.response.start", "status": status_code,
+                "headers": [(b"content-length", str(len(body)).encode("latin-1")), TEXT_PLAIN,
+                            (b"retry-after", str(retry_after).encode("latin-1"))]})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,173 @@
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.responses import RedirectResponse
+from starlette.middleware import Middleware
+from starlette.middleware.trustedhost import TrustedHostMiddleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.config import Config
+from starlette.datastructures import CommaSeparatedStrings
+from starlette.exceptions import HTTPException
+from loguru import logger
+import sys
+import contextlib
+
+from r3dir.exceptions import Base32DecodingError, StatusCodeNotInRangeError, WrongEncodedURLFormat, TooLongTarget
+from r3dir.server.access_log import AccessLog
+from r3dir.server.cache import DecodeCache
+from r3dir.server.dns import start_dns_server
+from r3dir.server.fast import FastRedirectApp
+from r3dir.server.metrics import Metrics, MetricsMiddleware
+from r3dir.server.store import TargetStore, TargetStoreMiddleware
+from r3dir.server.hits import HitLog, HitLogMiddleware
+from r3dir.server.admission import RateLimiter, AdmissionMiddleware
+from r3dir.server.payloads import PayloadStore, PayloadResponse
+
+async def parameter_redirect(request):
+    domain = request.url.hostname
+    try:
+        _, code = await decode_cache.decode_async(domain)
+    except (Base32DecodingError, StatusCodeNotInRangeError, WrongEncodedURLFormat, TooLongTarget) as e:
+        raise HTTPException(400, detail = f"{request.url} -> {e}\n" + PARAMETER_BASED_CORRECT_FORMAT)
+    try:
+        redirect_target = request.query_params['url']
+    except KeyError:
+        raise HTTPException(400, detail = f"Follow next format: IGNORING.PART.--.STATUS_CODE.{MAIN_DOMAIN}/--to/?url=TARGET_URL")
+    await access_log.log_async(request.url, redirect_target, code)
+    if hit_log is not None:
+        hit_log.record(request.scope, redirect_target, code)
+    return RedirectResponse(redirect_target, status_code = code)
+
+async def domain_redirect(request):
+    domain = request.url.hostname
+    try:
+        redirect_target, code = await decode_cache.decode_async(domain)
+    except TooLongTarget as e:
+        raise HTTPException(414, detail = f"{e}")
+    except (Base32DecodingError, StatusCodeNotInRangeError, WrongEncodedURLFormat) as e:
+        raise HTTPException(400, detail = f"{domain} -> {e}\n" + DOMAIN_BASED_CORRECT_FORMAT)
+    await access_log.log_async(request.url, redirect_target, code)
+    if hit_log is not None:
+        hit_log.record(request.scope, redirect_target, code)
+    if payloads is not None:
+        payload_name = payloads.payload_name(redirect_target, code)
+        if payload_name is not None:
+            return PayloadResponse(payloads.get(payload_name), code)
+    return RedirectResponse(redirect_target, status_code = code)
+
+config = Config()
+
+MAIN_DOMAIN = config("MAIN_DOMAIN")
+DECODE_CACHE_SIZE = config("DECODE_CACHE_SIZE", cast=int, default=4096)
+FAST_ASGI = config("FAST_ASGI", cast=bool, default=False)
+
+ACCESS_LOG_MODE = config("ACCESS_LOG_MODE", default="sync")
+ACCESS_LOG_FORMAT = config("ACCESS_LOG_FORMAT", default="text")
+ACCESS_LOG_QUEUE_SIZE = config("ACCESS_LOG_QUEUE_SIZE", cast=int, default=10000)
+ACCESS_LOG_FULL_POLICY = config("ACCESS_LOG_FULL_POLICY", default="drop")
+METRICS_PATH = config("METRICS_PATH", default=None)
+DNS_PORT = config("DNS_PORT", cast=int, default=None)
+DNS_HOST = config("DNS_HOST", default="0.0.0.0")
+DNS_A = config("DNS_A", cast=CommaSeparatedStrings, default="")
+DNS_AAAA = config("DNS_AAAA", cast=CommaSeparatedStrings, default="")
+DNS_TTL = config("DNS_TTL", cast=int, default=300)
+TARGET_STORE = config("TARGET_STORE", default=None)
+TARGET_STORE_CACHE_SIZE = config("TARGET_STORE_CACHE_SIZE", cast=int, default=4096)
+TARGET_STORE_NEGATIVE_TTL = config("TARGET_STORE_NEGATIVE_TTL", cast=float, default=5.0)
+TARGET_STORE_PATH = config("TARGET_STORE_PATH", default="/--register/")
+TARGET_STORE_TOKEN = config("TARGET_STORE_TOKEN", default=None)
+HIT_LOG = config("HIT_LOG", default=None)
+HIT_LOG_BUFFER_SIZE = config("HIT_LOG_BUFFER_SIZE", cast=int, default=65536)
+HIT_LOG_PATH = config("HIT_LOG_PATH", default="/--hits/")
+HIT_LOG_TOKEN = config("HIT_LOG_TOKEN", default=None)
+RATE_LIMIT = config("RATE_LIMIT", cast=float, default=0)
+RATE_LIMIT_BURST = config("RATE_LIMIT_BURST", cast=int, default=20)
+RATE_LIMIT_MAX_CLIENTS = config("RATE_LIMIT_MAX_CLIENTS", cast=int, default=65536)
+MAX_CONCURRENCY = config("MAX_CONCURRENCY", cast=int, default=0)
+PAYLOAD_DIR = config("PAYLOAD_DIR", default=None)
+PAYLOAD_MAX_CACHED_BYTES = config("PAYLOAD_MAX_CACHED_BYTES", cast=int, default=65536)
+PAYLOAD_MAX_TOTAL_CACHED_BYTES = config("PAYLOAD_MAX_TOTAL_CACHED_BYTES", cast=int, default=67108864)
+
+metrics = Metrics()
+target_store = TargetStore(TARGET_STORE, TARGET_STORE_CACHE_SIZE, TARGET_STORE_NEGATIVE_TTL) if TARGET_STORE else None
+hit_log = HitLog(HIT_LOG, HIT_LOG_BUFFER_SIZE) if HIT_LOG else None
+payloads = PayloadStore(PAYLOAD_DIR, PAYLOAD_MAX_CACHED_BYTES, PAYLOAD_MAX_TOTAL_CACHED_BYTES) if PAYLOAD_DIR else None
+decode_cache = DecodeCache(MAIN_DOMAIN, max_size=DECODE_CACHE_SIZE, decode=metrics.decode if METRICS_PATH else None,
+                           store=target_store, on_error=metrics.count_decode_error if METRICS_PATH else None)
+access_log = AccessLog(ACCESS_LOG_MODE, ACCESS_LOG_FORMAT, ACCESS_LOG_QUEUE_SIZE, ACCESS_LOG_FULL_POLICY)
+
+if METRICS_PATH:
+    access_log.log = metrics.timed("log", access_log.log)
+    metrics.register("r3dir_decode_cache_hits_total", "Decode cache hits", lambda: decode_cache.hits, "counter")
+    metrics.register("r3dir_decode_cache_misses_total", "Decode cache misses", lambda: decode_cache.misses, "counter")
+    metrics.register("r3dir_decode_cache_evictions_total", "Decode cache evictions", lambda: decode_cache.evictions, "counter")
+    metrics.register("r3dir_decode_cache_size", "Decoded hostnames in cache", lambda: len(decode_cache))
+    metrics.register("r3dir_access_log_dropped_total", "Dropped access log records", lambda: access_log.dropped, "counter")
+    if hit_log is not None:
+        metrics.register("r3dir_hit_log_written_total", "Hits written to the hit log", lambda: hit_log.written, "counter")
+        metrics.register("r3dir_hit_log_dropped_total", "Hits overwritten in the hit log buffer", lambda: hit_log.dropped, "counter")
+    if target_store is not None:
+        metrics.register("r3dir_target_store_cache_hits_total", "Target store read cache hits", lambda: target_store.hits, "counter")
+        metrics.register("r3dir_target_store_cache_misses_total", "Target store read cache misses", lambda: target_store.misses, "counter")
+    if payloads is not None:
+        metrics.register("r3dir_payloads", "Payloads in the payload directory", lambda: len(payloads))
+        metrics.register("r3dir_payload_reloads_total", "Reloads of changed payload directory", lambda: payloads.reloads, "counter")
+
+DOMAIN_BASED_CORRECT_FORMAT = f"Follow next format: IGNORING.PART.--.ENCODED.TARGET.STATUS_CODE.{MAIN_DOMAIN}"
+PARAMETER_BASED_CORRECT_FORMAT = f"Follow next format: IGNORING.PART.--.STATUS_CODE.{MAIN_DOMAIN}/--to/?url=TARGET_URL"
+
+logger.add(sys.stdout, format="<m>{level}</>:  <b>{message}</> | {time}", colorize=True)
+
+ALL_METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "CONNECT")
+
+middleware = [
+    Middleware(TrustedHostMiddleware, allowed_hosts=[f'*.{MAIN_DOMAIN}']),
+    Middleware(CORSMiddleware, allow_origin_regex='.*', allow_methods = ['*'],
+                allow_credentials = True, allow_headers=['*'])
+]
+
+routes = [
+    Route('/--to/', parameter_redirect, methods = ALL_METHODS), 
+    Route('/{rest_of_path:path}', domain_redirect, methods = ALL_METHODS) 
+]
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    dns_server = None
+    if DNS_PORT:
+        dns_server = await start_dns_server(MAIN_DOMAIN, DNS_A, DNS_AAAA, DNS_TTL, DNS_HOST, DNS_PORT)
+    yield
+    if dns_server:
+        dns_server.close()
+    access_log.close()
+    if target_store is not None:
+        target_store.close()
+    if hit_log is not None:
+        hit_log.close()
+    if payloads is not None:
+        payloads.close()
+
+starlette_app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
+
+fast_app = FastRedirectApp(MAIN_DOMAIN, decode_cache, access_log, DOMAIN_BASED_CORRECT_FORMAT, PARAMETER_BASED_CORRECT_FORMAT,
+                           lifespan=lifespan, hit_log=hit_log, payloads=payloads)
+
+app = fast_app if FAST_ASGI else starlette_app
+
+#registration endpoint is served only with a token, like the hits one
+if target_store is not None and TARGET_STORE_TOKEN:
+    app = TargetStoreMiddleware(app, target_store, MAIN_DOMAIN, TARGET_STORE_TOKEN, TARGET_STORE_PATH)
+
+if hit_log is not None and HIT_LOG_TOKEN:
+    app = HitLogMiddleware(app, hit_log, HIT_LOG_PATH, HIT_LOG_TOKEN)
+
+admission = None
+if RATE_LIMIT or MAX_CONCURRENCY:
+    rate_limiter = RateLimiter(RATE_LIMIT, RATE_LIMIT_BURST, RATE_LIMIT_MAX_CLIENTS) if RATE_LIMIT else None
+    app = admission = AdmissionMiddleware(app, rate_limiter, MAX_CONCURRENCY)
+
+if METRICS_PATH:
+    if admission is not None:
+        metrics.register("r3dir_rate_limited_total", "Requests rejected with 429 by client rate limit", lambda: admission.rate_limited, "counter")
+        metrics.register("r3dir_overloaded_total", "Requests rejected with 503 by concurrency cap", lambda: admission.overloaded, "counter")
+        metrics.register("r3dir_in_flight_requests", "Requests in progress", lambda: admission.in_flight)
+    app = MetricsMiddleware(app, metrics, METRICS_PATH)
@@ -0,0 +1,100 @@
+import asyncio
+from collections import OrderedDict
+
+import r3dir.encoder
+from r3dir.exceptions import WrongEncodedURLFormat, TooLongTarget
+from r3dir.server.store import NOT_CACHED
+
+
+class DecodeCache:
+    """Size-bounded LRU cache of decoded hostnames. Keeps successful
+       (target, status_code) results and the errors of malformed hosts,
+       so repeated hits of the same host skip base32 decoding and decompression.
+       Error and short ID domains are resolved with the target store if it's set,
+       `decode_async` queries SQLite of the store in a thread.
+       `on_error` is called with errors of cached malformed hosts, which skip `decode`,
+       and with TooLongTarget errors, which the store didn't resolve"""
+
+    def __init__(self, main_domain: str, max_size: int = 4096, decode=None, store=None, on_error=None):
+        self.main_domain = main_domain
+        self.max_size = max_size
+        self._decode = decode or r3dir.encoder.decode
+        self.store = store
+        self.on_error = on_error
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def decode(self, domain: str) -> tuple[str, int]:
+        """Cached equivalent of r3dir.encoder.decode() for the main domain"""
+
+        try:
+            return self._decode_cached(domain)
+        except TooLongTarget as e:
+            return self._resolved(domain, e, None if self.store is None else self.store.resolve(e))
+
+    async def decode_async(self, domain: str) -> tuple[str, int]:
+        """decode() for the event loop, targets missing in memory of the store are queried in a thread"""
+
+        try:
+            return self._decode_cached(domain)
+        except TooLongTarget as e:
+            result = None
+            if self.store is not None:
+                result = self.store.resolve_cached(e)
+                if result is NOT_CACHED:
+                    result = await asyncio.to_thread(self.store.resolve, e)
+            return self._resolved(domain, e, result)
+
+    def _decode_cached(self, domain: str) -> tuple[str, int]:
+        try:
+            result = self._entries[domain]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(domain)
+            if isinstance(result, WrongEncodedURLFormat):
+                #fresh instance, so tracebacks of cached errors don't pile up
+                error = type(result)(*result.args)
+                if self.on_error is not None:
+                    self.on_error(error)
+                raise error
+            return result
+
+        try:
+            result = self._decode(domain, self.main_domain)
+        except WrongEncodedURLFormat as e:
+            #negative caching of malformed hosts(covers Base32DecodingError and StatusCodeNotInRangeError)
+            self._store(domain, type(e)(*e.args))
+            raise
+        self._store(domain, result)
+        return result
+
+    def _resolved(self, domain: str, error: TooLongTarget, result: tuple[str, int] | None) -> tuple[str, int]:
+        #unknown targets aren't cached here, they can be registered later by any worker
+        if result is None:
+            if self.on_error is not None:
+                self.on_error(error)
+            raise error
+        self._store(domain, result)
+        return result
+
+    def _store(self, domain: str, result):
+        if self.max_size <= 0:
+            return
+        self._entries[domain] = result
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "max_size": self.max_size,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def __len__(self):
+        return len(self._entries)
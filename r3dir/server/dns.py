@@ -0,0 +1,233 @@
+"""Authoritative DNS responder for the wildcard zone of r3dir server.
+
+Answers A/AAAA queries for the main domain and for well-formed encoded hosts
+under it, so malformed hosts are rejected with NXDOMAIN before any HTTP request.
+Can be started with the server(DNS_PORT setting) or standalone:
+
+    python -m r3dir.server.dns -d r3dir.me --a 203.0.113.10 --port 5353
+"""
+import sys, socket, struct, asyncio
+import argparse
+import ipaddress
+
+from r3dir import encoder
+from r3dir.exceptions import TooLongTarget, WrongEncodedURLFormat
+
+TYPE_A = 1
+TYPE_SOA = 6
+TYPE_AAAA = 28
+CLASS_IN = 1
+
+RCODE_NOERROR = 0
+RCODE_FORMERR = 1
+RCODE_NXDOMAIN = 3
+RCODE_NOTIMP = 4
+RCODE_REFUSED = 5
+
+FLAG_QR = 0x8000
+FLAG_AA = 0x0400
+FLAG_RD = 0x0100
+OPCODE_MASK = 0x7800
+
+HEADER = struct.Struct("!HHHHHH")
+QUESTION_TAIL = struct.Struct("!HH")
+#Lets several server workers listen on the same port
+REUSE_PORT = hasattr(socket, "SO_REUSEPORT")
+
+BASE32_ALPHABET = frozenset("abcdefghijklmnopqrstuvwxyz234567")
+#Lengths of unpadded base32 strings, which can be produced by encoder
+BASE32_VALID_REMAINDERS = frozenset((0, 2, 4, 5, 7))
+
+
+def is_valid_host(name: str, main_domain: str) -> bool:
+    """Cheap check of a host under the main domain with the same rules as r3dir.encoder.decode():
+       status code in range and base32 encoded target. Doesn't decompress the target"""
+
+    if name == main_domain:
+        return True
+    try:
+        encoded_subdomains, _ = encoder._parse_domain(name, main_domain)
+    except TooLongTarget:
+        #Error domain of silent mode, server explains it with 414 response
+        return True
+    except WrongEncodedURLFormat:
+        return False
+    encoded_target = "".join(encoded_subdomains)
+    if encoded_target[:1] in encoder.CODEC_MARKERS:
+        encoded_target = encoded_target[1:]
+    return len(encoded_target) % 8 in BASE32_VALID_REMAINDERS and BASE32_ALPHABET.issuperset(encoded_target)
+
+
+def build_query(name: str, qtype: int = TYPE_A, query_id: int = 0) -> bytes:
+    """Raw DNS query with one question, used by benchmarks and tests"""
+
+    qname = b"".join(bytes((len(label),)) + label.encode("ascii") for label in name.split(".") if label)
+    return HEADER.pack(query_id, FLAG_RD, 1, 0, 0, 0) + qname + b"\x00" + QUESTION_TAIL.pack(qtype, CLASS_IN)
+
+
+class DNSResponder:
+    """Builds responses for raw DNS queries. Answer records are prebuilt wire-format templates,
+       which only need a compression pointer to the question name"""
+
+    def __init__(self, main_domain: str, ipv4: list[str] = (), ipv6: list[str] = (), ttl: int = 300):
+        self.main_domain = main_domain.lower().rstrip(".")
+        self.zone_labels = self.main_domain.split(".")
+        self.host_suffix = "." + self.main_domain
+        self.ttl = ttl
+        self.answers = {
+            TYPE_A: [self._record(TYPE_A, ipaddress.IPv4Address(ip).packed) for ip in ipv4],
+            TYPE_AAAA: [self._record(TYPE_AAAA, ipaddress.IPv6Address(ip).packed) for ip in ipv6],
+        }
+        self.queries = 0
+        self.rejected = 0
+
+    def _record(self, record_type: int, rdata: bytes) -> bytes:
+        """Resource record without the owner name"""
+
+        return struct.pack("!HHIH", record_type, CLASS_IN, self.ttl, len(rdata)) + rdata
+
+    def _soa(self, zone_offset: int) -> bytes:
+        """SOA record of the zone, names are compressed relatively to zone name in the question"""
+
+        zone_pointer = struct.pack("!H", 0xC000 | zone_offset)
+        rdata = (b"\x02ns" + zone_pointer + b"\x0ahostmaster" + zone_pointer
+                 + struct.pack("!IIIII", 1, 3600, 600, 86400, self.ttl))
+        return zone_pointer + self._record(TYPE_SOA, rdata)
+
+    def handle(self, query: bytes) -> bytes | None:
+        """Returns response for raw DNS query or None if the query should be ignored"""
+
+        if len(query) < HEADER.size:
+            return None
+        query_id, flags, qdcount, _, _, _ = HEADER.unpack_from(query)
+        if flags & FLAG_QR:
+            return None
+        self.queries += 1
+        response_flags = FLAG_QR | (flags & (OPCODE_MASK | FLAG_RD))
+
+        if flags & OPCODE_MASK:
+            return HEADER.pack(query_id, response_flags | RCODE_NOTIMP, 0, 0, 0, 0)
+        if qdcount != 1:
+            return HEADER.pack(query_id, response_flags | RCODE_FORMERR, 0, 0, 0, 0)
+
+        #Question name parsing
+        labels = []
+        offset = HEADER.size
+        try:
+            while length := query[offset]:
+                if length > 63:
+                    #compression pointers are not expected in questions
+                    raise ValueError
+                labels.append(query[offset + 1:offset + 1 + length])
+                offset += length + 1
+            qtype, qclass = QUESTION_TAIL.unpack_from(query, offset + 1)
+            name = b".".join(labels).decode("ascii").lower()
+        except (IndexError, ValueError, struct.error):
+            return HEADER.pack(query_id, response_flags | RCODE_FORMERR, 0, 0, 0, 0)
+        question = query[HEADER.size:offset + 1 + QUESTION_TAIL.size]
+
+        if qclass != CLASS_IN or not (name == self.main_domain or name.endswith(self.host_suffix)):
+            self.rejected += 1
+            return HEADER.pack(query_id, response_flags | RCODE_REFUSED, 1, 0, 0, 0) + question
+
+        response_flags |= FLAG_AA
+        zone_offset = HEADER.size + sum(len(label) + 1 for label in labels[:len(labels) - len(self.zone_labels)])
+
+        if not is_valid_host(name, self.main_domain):
+            self.rejected += 1
+            return (HEADER.pack(query_id, response_flags | RCODE_NXDOMAIN, 1, 0, 1, 0)
+                    + question + self._soa(zone_offset))
+
+        if qtype == TYPE_SOA and name == self.main_domain:
+            return HEADER.pack(query_id, response_flags, 1, 1, 0, 0) + question + self._soa(zone_offset)
+
+        answers = self.answers.get(qtype)
+        if not answers:
+            return HEADER.pack(query_id, response_flags, 1, 0, 1, 0) + question + self._soa(zone_offset)
+        return (HEADER.pack(query_id, response_flags, 1, len(answers), 0, 0) + question
+                + b"".join(b"\xc0\x0c" + answer for answer in answers))
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, responder: DNSResponder):
+        self.responder = responder
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        response = self.responder.handle(data)
+        if response is not None:
+            self.transport.sendto(response, addr)
+
+
+class DNSServer:
+    """UDP and TCP listeners of DNSResponder"""
+
+    def __init__(self, responder: DNSResponder):
+        self.responder = responder
+        self.udp_transport = None
+        self.tcp_server = None
+
+    async def start(self, host: str = "0.0.0.0", port: int = 53):
+        loop = asyncio.get_running_loop()
+        self.udp_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UDPProtocol(self.responder), local_addr=(host, port), reuse_port=REUSE_PORT)
+        self.tcp_server = await asyncio.start_server(self._handle_tcp, host, port, reuse_port=REUSE_PORT)
+        return self
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                length, = struct.unpack("!H", await reader.readexactly(2))
+                response = self.responder.handle(await reader.readexactly(length))
+                if response is None:
+                    break
+                writer.write(struct.pack("!H", len(response)) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        if self.udp_transport:
+            self.udp_transport.close()
+        if self.tcp_server:
+            self.tcp_server.close()
+
+
+async def start_dns_server(main_domain: str, ipv4: list[str], ipv6: list[str], ttl: int = 300,
+                           host: str = "0.0.0.0", port: int = 53) -> DNSServer:
+    return await DNSServer(DNSResponder(main_domain, ipv4, ipv6, ttl)).start(host, port)
+
+
+def _cli():
+    argParser = argparse.ArgumentParser(description='Authoritative DNS responder for r3dir wildcard zone')
+    argParser.add_argument('-d', '--main_domain', type = str, required = True,
+                            help = "Domain where r3dir tool is hosted on")
+    argParser.add_argument('--a', type = str, action = 'append', default = [],
+                            help = "IPv4 address of the HTTP server (can be repeated)")
+    argParser.add_argument('--aaaa', type = str, action = 'append', default = [],
+                            help = "IPv6 address of the HTTP server (can be repeated)")
+    argParser.add_argument('--ttl', type = int, default = 300,
+                            help = "TTL of answers (default: %(default)s)")
+    argParser.add_argument('--host', type = str, default = "0.0.0.0",
+                            help = "Listening address (default: %(default)s)")
+    argParser.add_argument('--port', type = int, default = 53,
+                            help = "Listening UDP/TCP port (default: %(default)s)")
+    args = argParser.parse_args()
+
+    async def serve():
+        await start_dns_server(args.main_domain, args.a, args.aaaa, args.ttl, args.host, args.port)
+        print(f"[+] DNS responder for {args.main_domain} is listening on {args.host}:{args.port}", file=sys.stderr)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    _cli()
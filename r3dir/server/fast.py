@@ -0,0 +1,216 @@
+import re
+import contextlib
+from urllib.parse import quote, urlsplit, parse_qsl
+
+from r3dir.exceptions import TooLongTarget, WrongEncodedURLFormat
+from r3dir.server.access_log import AccessLog
+from r3dir.server.cache import DecodeCache
+from r3dir.server.payloads import send_payload
+
+#Same matching rules as Starlette routes of the server
+PARAMETER_ROUTE_REGEX = re.compile("^/--to/$")
+CATCH_ALL_ROUTE_REGEX = re.compile("^/(?P<rest_of_path>.*)$")
+SIMPLE_HOST_REGEX = re.compile("[A-Za-z0-9._-]+(:[0-9]*)?")
+
+ROUTE_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "CONNECT"))
+CORS_METHODS = ("DELETE", "GET", "HEAD", "OPTIONS", "PATCH", "POST", "PUT")
+
+TEXT_PLAIN = (b"content-type", b"text/plain; charset=utf-8")
+CORS_SIMPLE_HEADERS = (b"access-control-allow-credentials", b"true")
+CORS_PREFLIGHT_HEADERS = [
+    (b"vary", b"Origin"),
+    (b"access-control-allow-methods", ", ".join(CORS_METHODS).encode("latin-1")),
+    (b"access-control-max-age", b"600"),
+    (b"access-control-allow-credentials", b"true"),
+]
+LOCATION_SAFE_CHARS = ":/%#?=@[]!$&'()*+,;"
+
+
+class FastRedirectApp:
+    """Lean ASGI application with the same observable behaviour as the Starlette
+       application of the server(TrustedHostMiddleware, CORSMiddleware, routes
+       and error responses), but without per-request Request/Response objects"""
+
+    def __init__(self, main_domain: str, decode_cache: DecodeCache, access_log: AccessLog,
+                 domain_based_format: str, parameter_based_format: str, lifespan=None, hit_log=None, payloads=None):
+        self.main_domain = main_domain
+        self.host_suffix = "." + main_domain
+        self.decode_cache = decode_cache
+        self.access_log = access_log
+        self.hit_log = hit_log
+        self.payloads = payloads
+        self.lifespan = lifespan
+        self.domain_based_format = domain_based_format
+        self.parameter_based_format = parameter_based_format
+        self.allow_header = (b"allow", ", ".join(ROUTE_METHODS).encode("latin-1"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            response_started = False
+
+            async def _send(message):
+                nonlocal response_started
+                if message["type"] == "http.response.start":
+                    response_started = True
+                await send(message)
+
+            try:
+                await self.handle_http(scope, _send)
+            except Exception:
+                if not response_started:
+                    await _send_response(send, 500, [TEXT_PLAIN], b"Internal Server Error")
+                raise
+        elif scope["type"] == "lifespan":
+            await self.handle_lifespan(receive, send)
+        elif scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1000, "reason": ""})
+
+    async def handle_lifespan(self, receive, send):
+        lifespan = self.lifespan(self) if self.lifespan else contextlib.nullcontext()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await lifespan.__aenter__()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await lifespan.__aexit__(None, None, None)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def handle_http(self, scope, send):
+        host = origin = cors_method = cors_headers = None
+        for key, value in scope["headers"]:
+            if key == b"host":
+                if host is None:
+                    host = value.decode("latin-1")
+            elif key == b"origin":
+                if origin is None:
+                    origin = value
+            elif key == b"access-control-request-method":
+                if cors_method is None:
+                    cors_method = value
+            elif key == b"access-control-request-headers":
+                if cors_headers is None:
+                    cors_headers = value
+
+        #TrustedHostMiddleware
+        if not (host or "").split(":")[0].endswith(self.host_suffix):
+            await _send_response(send, 400, [TEXT_PLAIN], b"Invalid host header")
+            return
+
+        #CORSMiddleware
+        extra_headers = ()
+        if origin is not None:
+            if scope["method"] == "OPTIONS" and cors_method is not None:
+                await self.preflight_response(send, origin, cors_method, cors_headers)
+                return
+            extra_headers = (CORS_SIMPLE_HEADERS, (b"access-control-allow-origin", origin), (b"vary", b"Origin"))
+
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+
+        if PARAMETER_ROUTE_REGEX.match(path):
+            handler = self.parameter_redirect
+        elif CATCH_ALL_ROUTE_REGEX.match(path):
+            handler = self.domain_redirect
+        else:
+            await _send_response(send, 404, [TEXT_PLAIN], b"Not Found", extra_headers)
+            return
+
+        if scope["method"] not in ROUTE_METHODS:
+            await _send_response(send, 405, [self.allow_header, TEXT_PLAIN], b"Method Not Allowed", extra_headers)
+            return
+
+        await handler(scope, send, host, extra_headers)
+
+    async def domain_redirect(self, scope, send, host, extra_headers):
+        domain = _hostname(scope, host)
+        try:
+            redirect_target, code = await self.decode_cache.decode_async(domain)
+        except TooLongTarget as e:
+            await _send_response(send, 414, [TEXT_PLAIN], f"{e}".encode("utf-8"), extra_headers)
+            return
+        except WrongEncodedURLFormat as e:
+            detail = f"{domain} -> {e}\n" + self.domain_based_format
+            await _send_response(send, 400, [TEXT_PLAIN], detail.encode("utf-8"), extra_headers)
+            return
+        await self.access_log.log_async(_request_url(scope, host), redirect_target, code)
+        if self.hit_log is not None:
+            self.hit_log.record(scope, redirect_target, code)
+        if self.payloads is not None:
+            payload_name = self.payloads.payload_name(redirect_target, code)
+            if payload_name is not None:
+                await send_payload(scope, send, self.payloads.get(payload_name), code, extra_headers)
+                return
+        await _send_redirect(send, redirect_target, code, extra_headers)
+
+    async def parameter_redirect(self, scope, send, host, extra_headers):
+        domain = _hostname(scope, host)
+        try:
+            _, code = await self.decode_cache.decode_async(domain)
+        except (WrongEncodedURLFormat, TooLongTarget) as e:
+            detail = f"{_request_url(scope, host)} -> {e}\n" + self.parameter_based_format
+            await _send_response(send, 400, [TEXT_PLAIN], detail.encode("utf-8"), extra_headers)
+            return
+        redirect_target = None
+        for key, value in parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True):
+            if key == "url":
+                redirect_target = value
+        if redirect_target is None:
+            await _send_response(send, 400, [TEXT_PLAIN], self.parameter_based_format.encode("utf-8"), extra_headers)
+            return
+        await self.access_log.log_async(_request_url(scope, host), redirect_target, code)
+        if self.hit_log is not None:
+            self.hit_log.record(scope, redirect_target, code)
+        await _send_redirect(send, redirect_target, code, extra_headers)
+
+    async def preflight_response(self, send, origin, cors_method, cors_headers):
+        headers = CORS_PREFLIGHT_HEADERS + [(b"access-control-allow-origin", origin)]
+        if cors_headers is not None:
+            headers.append((b"access-control-allow-headers", cors_headers))
+        headers.append(TEXT_PLAIN)
+        if cors_method.decode("latin-1") not in CORS_METHODS:
+            await _send_response(send, 400, headers, b"Disallowed CORS method")
+        else:
+            await _send_response(send, 200, headers, b"OK")
+
+
+def _hostname(scope, host: str) -> str:
+    """Equivalent of Starlette's request.url.hostname, skipping URL parsing for plain hosts"""
+
+    if SIMPLE_HOST_REGEX.fullmatch(host):
+        query_string = scope.get("query_string", b"")
+        if not query_string.isascii():
+            #Starlette builds the whole URL, so non UTF-8 query strings fail there
+            query_string.decode()
+        return host.split(":")[0].lower()
+    return urlsplit(_request_url(scope, host)).hostname
+
+def _request_url(scope, host: str) -> str:
+    """Equivalent of str(request.url) for requests with Host header"""
+
+    url = f"{scope.get('scheme', 'http')}://{host}{scope['path']}"
+    query_string = scope.get("query_string", b"")
+    if query_string:
+        url += "?" + query_string.decode()
+    return url
+
+async def _send_redirect(send, target: str, code: int, extra_headers=()):
+    location = quote(target, safe=LOCATION_SAFE_CHARS).encode("latin-1")
+    if code in (204, 304):
+        headers = [(b"location", location)]
+    else:
+        headers = [(b"content-length", b"0"), (b"location", location)]
+    headers.extend(extra_headers)
+    await send({"type": "http.response.start", "status": code, "headers": headers})
+    await send({"type": "http.response.body", "body": b""})
+
+async def _send_response(send, code: int, headers: list, body: bytes, extra_headers=()):
+    """Sends response with body. Content-Length header is inserted before trailing Content-Type one"""
+
+    headers = headers[:-1] + [(b"content-length", str(len(body)).encode("latin-1")), headers[-1]]
+    headers.extend(extra_headers)
+    await send({"type": "http.response.start", "status": code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
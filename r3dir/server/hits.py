@@ -0,0 +1,197 @@
+"""Hit log of served redirects, which are evidence of SSRF requests made by targets.
+
+The request only appends a raw record to a fixed-size in-memory ring buffer. A background thread
+drains the buffer every `flush_interval` seconds and writes records to SQLite file in one transaction.
+If the writer falls behind, the oldest unwritten records are overwritten and counted as dropped.
+Every worker process writes to the same file, hits are queried by encoded host or time range.
+"""
+import time
+import hmac
+import asyncio
+import pathlib
+import sqlite3
+import threading
+from collections import deque
+from urllib.parse import parse_qsl
+
+from r3dir.server.store import _send_json
+
+HIT_FIELDS = ("time", "client", "host", "path", "method", "user_agent", "target", "status_code")
+MAX_QUERY_LIMIT = 10000
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS hits ("
+    "id INTEGER PRIMARY KEY, time REAL NOT NULL, client TEXT, host TEXT NOT NULL, path TEXT, "
+    "method TEXT, user_agent TEXT, target TEXT, status_code INTEGER)",
+    "CREATE INDEX IF NOT EXISTS hits_host_time ON hits (host, time)",
+    "CREATE INDEX IF NOT EXISTS hits_time ON hits (time)",
+)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    for statement in SCHEMA:
+        connection.execute(statement)
+    return connection
+
+
+def connect_readonly(path: str) -> sqlite3.Connection:
+    """Connection for queries of hit log file, e.g. while the server is running"""
+
+    return sqlite3.connect(f"{pathlib.Path(path).absolute().as_uri()}?mode=ro", uri=True, timeout=30)
+
+
+def _hit(record: tuple) -> tuple:
+    """Row of the hits table from raw record of ASGI scope"""
+
+    timestamp, client, headers, path, method, target, status_code = record
+    host = user_agent = None
+    for name, value in headers:
+        if name == b"host":
+            host = value.decode("latin-1")
+        elif name == b"user-agent":
+            user_agent = value.decode("latin-1")
+    host = (host or "").lower()
+    if not host.endswith("]"):
+        #stripping port
+        host = host.rsplit(":", 1)[0]
+    client = client[0] if client else None
+    return timestamp, client, host, path, method, user_agent, target, status_code
+
+
+def query(connection: sqlite3.Connection, host: str | None = None, since: float | None = None,
+          until: float | None = None, limit: int = 100) -> list[dict]:
+    """The latest hits of the encoded host and/or time range"""
+
+    conditions, parameters = [], []
+    if host is not None:
+        conditions.append("host = ?")
+        parameters.append(host.lower())
+    if since is not None:
+        conditions.append("time >= ?")
+        parameters.append(since)
+    if until is not None:
+        conditions.append("time < ?")
+        parameters.append(until)
+    #negative LIMIT of SQLite means no limit
+    limit = max(1, min(limit, MAX_QUERY_LIMIT))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = connection.execute(f"SELECT {', '.join(HIT_FIELDS)} FROM hits {where} ORDER BY time DESC LIMIT ?",
+                              (*parameters, limit))
+    return [dict(zip(HIT_FIELDS, row)) for row in rows]
+
+
+class HitLog:
+    """Ring buffer of hits with batched background writes to SQLite"""
+
+    def __init__(self, path: str, buffer_size: int = 65536, flush_interval: float = 0.5):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._connection = _connect(path)
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, scope: dict, target: str, status_code: int):
+        """Records served redirect. Only appends to the ring buffer, so it's cheap on the request path"""
+
+        if len(self._buffer) == self.buffer_size:
+            self.dropped += 1
+        self._buffer.append((time.time(), scope.get("client"), scope["headers"], scope["path"],
+                             scope["method"], target, status_code))
+        if self._thread is None:
+            self._start()
+
+    def flush(self):
+        """Writes buffered records"""
+
+        with self._write_lock:
+            rows = []
+            try:
+                while True:
+                    rows.append(_hit(self._buffer.popleft()))
+            except IndexError:
+                pass
+            if rows:
+                with self._connection:
+                    self._connection.execute("BEGIN")
+                    self._connection.executemany("INSERT INTO hits (time, client, host, path, method, user_agent, "
+                                                 "target, status_code) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.written += len(rows)
+
+    def query(self, host: str | None = None, since: float | None = None,
+              until: float | None = None, limit: int = 100) -> list[dict]:
+        self.flush()
+        with self._write_lock:
+            return query(self._connection, host, since, until, limit)
+
+    def close(self):
+        """Flushes buffered records and stops the background thread"""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self._connection.close()
+
+    def stats(self) -> dict:
+        return {"buffered": len(self._buffer), "written": self.written, "dropped": self.dropped}
+
+    def _start(self):
+        with self._write_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="r3dir-hit-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+class HitLogMiddleware:
+    """ASGI middleware, which serves hits on `path` on any host:
+
+        GET /--hits/?host=ENCODED.HOST&since=UNIX_TIME&until=UNIX_TIME&limit=100
+        Authorization: Bearer <token>
+        -> {"hits": [{"time": ..., "client": ..., "host": ..., ...}, ...]}"""
+
+    def __init__(self, app, hit_log: HitLog, path: str, token: str):
+        self.app = app
+        self.hit_log = hit_log
+        self.path = path
+        self.authorization = f"Bearer {token}".encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] != "GET":
+            await _send_json(send, 405, {"error": "Method Not Allowed"}, [(b"allow", b"GET")])
+            return
+        authorization = dict(scope["headers"]).get(b"authorization", b"")
+        if not hmac.compare_digest(authorization, self.authorization):
+            await _send_json(send, 401, {"error": "Unauthorized"}, [(b"www-authenticate", b"Bearer")])
+            return
+
+        parameters = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        try:
+            since = float(parameters["since"]) if "since" in parameters else None
+            until = float(parameters["until"]) if "until" in parameters else None
+            limit = int(parameters.get("limit", 100))
+            if limit < 1:
+                raise ValueError("limit should be positive")
+        except ValueError as e:
+            await _send_json(send, 400, {"error": f"ValueError: {e}"})
+            return
+        #flush and SQLite query take the write lock of the background thread, so they run off the event loop
+        hits = await asyncio.to_thread(self.hit_log.query, parameters.get("host"), since, until, limit)
+        await _send_json(send, 200, {"hits": hits})
+
@@ -0,0 +1,165 @@
+import os, time
+from bisect import bisect_left
+
+import r3dir.encoder
+from r3dir.exceptions import BaseCoderError, TooLongTarget
+
+#Latency buckets in seconds, from 1us up to 1s
+DEFAULT_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025,
+                   0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+PROMETHEUS_CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Histogram with fixed buckets. Stores per-bucket counts, cumulative ones are built on export"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Per-worker metrics of the server. Every worker process aggregates its own values
+       in plain counters from the event loop thread, so no locks are taken on the request path.
+       Exported samples are labeled with worker PID to be summed up by Prometheus"""
+
+    def __init__(self):
+        self.requests = {}
+        self.decode_errors = {}
+        self.stages = {}
+        self.callbacks = {}
+        self.worker = str(os.getpid())
+
+    def count_request(self, route: str, status_code: int):
+        key = (route, status_code)
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+    def count_decode_error(self, error: Exception):
+        name = type(error).__name__
+        self.decode_errors[name] = self.decode_errors.get(name, 0) + 1
+
+    def observe_stage(self, stage: str, duration: float):
+        try:
+            histogram = self.stages[stage]
+        except KeyError:
+            histogram = self.stages[stage] = Histogram()
+        histogram.observe(duration)
+
+    def register(self, name: str, help_text: str, func, metric_type: str = "gauge"):
+        """Registers a value read on export, e.g. decode cache counters"""
+
+        self.callbacks[name] = (help_text, metric_type, func)
+
+    def timed(self, stage: str, func):
+        """Wraps func to record its duration as the stage"""
+
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe_stage(stage, perf_counter() - start)
+        return wrapper
+
+    def decode(self, domain: str, main_domain: str) -> tuple[str, int]:
+        """r3dir.encoder.decode(), which records time of each decoding stage
+           and decoding errors by exception class. TooLongTarget isn't counted here, as the target store
+           can resolve it, DecodeCache reports the unresolved ones to `on_error`"""
+
+        try:
+            return r3dir.encoder.decode(domain, main_domain, observe=self.observe_stage)
+        except TooLongTarget:
+            raise
+        except BaseCoderError as e:
+            self.count_decode_error(e)
+            raise
+
+    def render(self) -> str:
+        """Exports metrics in Prometheus text format"""
+
+        worker = f'worker="{self.worker}"'
+        lines = [
+            "# HELP r3dir_requests_total Served requests by route and status code",
+            "# TYPE r3dir_requests_total counter",
+        ]
+        for (route, status_code), value in sorted(self.requests.items()):
+            lines.append(f'r3dir_requests_total{{{worker},route="{route}",status="{status_code}"}} {value}')
+
+        lines += [
+            "# HELP r3dir_decode_errors_total Domain decoding errors by exception class",
+            "# TYPE r3dir_decode_errors_total counter",
+        ]
+        for name, value in sorted(self.decode_errors.items()):
+            lines.append(f'r3dir_decode_errors_total{{{worker},exception="{name}"}} {value}')
+
+        lines += [
+            "# HELP r3dir_stage_duration_seconds Time spent in each stage of request handling",
+            "# TYPE r3dir_stage_duration_seconds histogram",
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            labels = f'{worker},stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'r3dir_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'r3dir_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'r3dir_stage_duration_seconds_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'r3dir_stage_duration_seconds_count{{{labels}}} {histogram.count}')
+
+        for name, (help_text, metric_type, func) in self.callbacks.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name}{{{worker}}} {func()}"]
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware, which counts requests by route and status code, measures
+       whole request handling time and serves metrics on `path`"""
+
+    def __init__(self, app, metrics: Metrics, path: str, parameter_route: str = "/--to/"):
+        self.app = app
+        self.metrics = metrics
+        self.path = path
+        self.parameter_route = parameter_route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path == self.path:
+            body = self.metrics.render().encode("utf-8")
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-length", str(len(body)).encode("latin-1")),
+                                    (b"content-type", PROMETHEUS_CONTENT_TYPE)]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        route = "parameter" if path == self.parameter_route else "domain"
+        status_code = 500
+
+        async def _send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            self.metrics.observe_stage("request", time.perf_counter() - start)
+            self.metrics.count_request(route, status_code)
@@ -0,0 +1,170 @@
+"""Payload hosting. Hosts with non-3xx status codes, which decode to `payload:NAME` target, get
+the NAME file of the payload directory as the response body with this status code instead of
+a redirect, e.g. XSS/XXE/SVG payloads or fake metadata JSON.
+
+The directory is scanned into an in-memory index, bodies of small payloads are kept in it up to
+the total size limit, so hot payloads don't touch the disk. Large payloads are sent with `http.response.pathsend` ASGI
+extension if the server supports it, otherwise they're read in chunks from a memory-mapped file.
+A background thread rescans the directory, so changed payloads are served without a restart.
+"""
+import os
+import mmap
+import threading
+import mimetypes
+from typing import NamedTuple
+
+PAYLOAD_PREFIX = "payload:"
+CHUNK_SIZE = 65536
+#responses, which can't have a body
+NO_BODY_CODES = (204, 304)
+
+
+class Payload(NamedTuple):
+    path: str
+    content_type: bytes
+    size: int
+    mtime_ns: int
+    body: bytes | None
+
+
+def _content_type(name: str) -> bytes:
+    content_type, _ = mimetypes.guess_type(name)
+    content_type = content_type or "application/octet-stream"
+    if content_type.startswith("text/"):
+        content_type += "; charset=utf-8"
+    return content_type.encode("latin-1")
+
+
+class PayloadStore:
+    """Index of files in the payload directory. Files up to `max_cached_bytes` bytes are kept in memory
+       until their total size reaches `max_total_cached_bytes`, the rest are sent from the disk"""
+
+    def __init__(self, directory: str, max_cached_bytes: int = 65536, max_total_cached_bytes: int = 67108864,
+                 reload_interval: float = 1.0):
+        self.directory = os.path.abspath(directory)
+        self.max_cached_bytes = max_cached_bytes
+        self.max_total_cached_bytes = max_total_cached_bytes
+        self.cached_bytes = 0
+        self.reload_interval = reload_interval
+        self.reloads = 0
+        self._payloads = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.scan()
+
+    def scan(self):
+        """Rescans the directory. Unchanged files keep their cached bodies"""
+
+        payloads = {}
+        changed = False
+        cached_bytes = 0
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                path = os.path.join(root, file)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                try:
+                    stat = os.stat(path)
+                    payload = self._payloads.get(name)
+                    cache = (stat.st_size <= self.max_cached_bytes and
+                             cached_bytes + stat.st_size <= self.max_total_cached_bytes)
+                    if (payload is None or (payload.size, payload.mtime_ns) != (stat.st_size, stat.st_mtime_ns)
+                            or (payload.body is not None) != cache):
+                        body = None
+                        if cache:
+                            with open(path, "rb") as payload_file:
+                                body = payload_file.read()
+                        payload = Payload(path, _content_type(name), len(body) if body is not None else stat.st_size,
+                                          stat.st_mtime_ns, body)
+                        changed = True
+                except OSError:
+                    #file was removed during the scan
+                    continue
+                payloads[name] = payload
+                if payload.body is not None:
+                    cached_bytes += payload.size
+        if changed or payloads.keys() != self._payloads.keys():
+            self.reloads += 1
+        #readers see either the old or the new index
+        self._payloads = payloads
+        self.cached_bytes = cached_bytes
+
+    def get(self, name: str) -> Payload | None:
+        if self._thread is None:
+            self._start()
+        return self._payloads.get(name)
+
+    def payload_name(self, target: str, status_code: int) -> str | None:
+        """Name of the payload, which the decoded target points to, or None for targets to redirect to"""
+
+        if 300 <= status_code < 400 or not target.startswith(PAYLOAD_PREFIX):
+            return None
+        return target[len(PAYLOAD_PREFIX):]
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="r3dir-payloads", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.reload_interval):
+            self.scan()
+
+
+async def send_payload(scope, send, payload: Payload | None, status_code: int, extra_headers=()):
+    """Sends the payload as the response body with the status code of the host. Unknown payloads get 404"""
+
+    if payload is None:
+        body = b"Payload not found"
+        headers = [(b"content-length", str(len(body)).encode("latin-1")), (b"content-type", b"text/plain; charset=utf-8")]
+        await send({"type": "http.response.start", "status": 404, "headers": headers + list(extra_headers)})
+        await send({"type": "http.response.body", "body": body})
+        return
+
+    if status_code in NO_BODY_CODES:
+        await send({"type": "http.response.start", "status": status_code, "headers": list(extra_headers)})
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    if payload.body is not None:
+        headers = [(b"content-length", str(payload.size).encode("latin-1")), (b"content-type", payload.content_type)]
+        await send({"type": "http.response.start", "status": status_code, "headers": headers + list(extra_headers)})
+        await send({"type": "http.response.body", "body": payload.body})
+        return
+
+    with open(payload.path, "rb") as file:
+        #size of the opened file, the payload could change after the scan
+        size = os.fstat(file.fileno()).st_size
+        headers = [(b"content-length", str(size).encode("latin-1")), (b"content-type", payload.content_type)]
+        await send({"type": "http.response.start", "status": status_code, "headers": headers + list(extra_headers)})
+        if "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": payload.path})
+            return
+        if not size:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, size, CHUNK_SIZE):
+                end = min(offset + CHUNK_SIZE, size)
+                await send({"type": "http.response.body", "body": mapped[offset:end], "more_body": end < size})
+
+
+class PayloadResponse:
+    """ASGI response of Starlette endpoints, same as responses of the fast application"""
+
+    def __init__(self, payload: Payload | None, status_code: int):
+        self.payload = payload
+        self.status_code = status_code
+
+    async def __call__(self, scope, receive, send):
+        await send_payload(scope, send, self.payload, self.status_code)
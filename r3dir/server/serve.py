@@ -0,0 +1,143 @@
+"""Multi-worker runner of r3dir server, used by `r3dir serve`.
+
+A supervisor process starts N uvicorn workers, which share the listening port, and
+restarts crashed ones. With SO_REUSEPORT every worker binds its own socket and the kernel
+balances connections between them, otherwise workers accept on one inherited socket.
+Server settings are passed to workers as environment variables read by r3dir.server.app.
+"""
+import os, time, signal, socket
+import multiprocessing
+from multiprocessing.connection import wait
+
+from loguru import logger
+
+REUSE_PORT = hasattr(socket, "SO_REUSEPORT")
+#Workers, which crash sooner than MIN_UPTIME seconds after start, are restarted with growing delay
+MIN_UPTIME = 1.0
+MAX_RESTART_DELAY = 30.0
+SHUTDOWN_TIMEOUT = 30.0
+
+
+def bind_socket(host: str, port: int, reuse_port: bool = False) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    #explicit protocol, asyncio enables TCP_NODELAY only on accepted sockets with IPPROTO_TCP, otherwise
+    #responses with a body wait for delayed ACK(~40ms) between headers and body
+    sock = socket.socket(family, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(options: dict, sock: socket.socket | None):
+    import uvicorn
+
+    config = uvicorn.Config("r3dir.server.app:app", **options)
+    if sock is None:
+        sock = bind_socket(config.host, config.port, reuse_port=True)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Pre-fork supervisor of server workers"""
+
+    def __init__(self, workers: int, options: dict, reuse_port: bool = REUSE_PORT):
+        self.workers = workers
+        self.options = options
+        self.reuse_port = reuse_port
+        self.context = multiprocessing.get_context("spawn")
+        self.processes = [None] * workers
+        self.started = [0.0] * workers
+        self.restart_delay = [0.0] * workers
+        self.restart_at = [None] * workers
+        self.restarts = 0
+        self.sock = None
+        self.should_exit = False
+
+    def start(self):
+        #Binding in the supervisor reports busy port once instead of crashing every worker
+        self.sock = bind_socket(self.options["host"], self.options["port"], self.reuse_port)
+        #port 0 is resolved once, so all workers share the same port
+        self.options = {**self.options, "port": self.sock.getsockname()[1]}
+        if self.reuse_port:
+            #the socket isn't listening, so it doesn't take connections from workers
+            self.sock.close()
+            self.sock = None
+        for index in range(self.workers):
+            self._start_worker(index)
+
+    def _start_worker(self, index: int):
+        process = self.context.Process(target=_run_worker, args=(self.options, self.sock),
+                                       name=f"r3dir-worker-{index}")
+        process.start()
+        self.processes[index] = process
+        self.started[index] = time.monotonic()
+        logger.info(f"Started worker {process.pid}")
+
+    def check(self, timeout: float = 0.5):
+        """Waits up to timeout for worker exits and restarts exited workers"""
+
+        now = time.monotonic()
+        pending = [restart_at - now for restart_at in self.restart_at if restart_at is not None]
+        wait([process.sentinel for process in self.processes if process.is_alive()], max(min([timeout, *pending]), 0))
+
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if self.should_exit or process.is_alive():
+                continue
+            if self.restart_at[index] is None:
+                process.join()
+                if now - self.started[index] < MIN_UPTIME:
+                    self.restart_delay[index] = min(max(self.restart_delay[index] * 2, MIN_UPTIME), MAX_RESTART_DELAY)
+                else:
+                    self.restart_delay[index] = 0.0
+                self.restart_at[index] = now + self.restart_delay[index]
+                logger.warning(f"Worker {process.pid} exited with code {process.exitcode}, "
+                               f"restarting in {self.restart_delay[index]}s")
+            if now >= self.restart_at[index]:
+                self.restart_at[index] = None
+                self.restarts += 1
+                self._start_worker(index)
+
+    def stop(self):
+        self.should_exit = True
+        for process in self.processes:
+            if process and process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for process in self.processes:
+            if process:
+                process.join(max(deadline - time.monotonic(), 0))
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+        if self.sock:
+            self.sock.close()
+
+    def _handle_exit(self, signum, frame):
+        self.should_exit = True
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._handle_exit)
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        self.start()
+        try:
+            while not self.should_exit:
+                self.check()
+        finally:
+            self.stop()
+
+
+def serve(host: str = "0.0.0.0", port: int = 80, workers: int = 1, settings: dict | None = None,
+          loop: str = "auto", http: str = "auto", proxy_headers: bool = False, log_level: str = "info"):
+    """Runs the server with `workers` processes. `settings` are environment variables of
+       r3dir.server.app(e.g. MAIN_DOMAIN), `loop`/`http` set to `auto` pick uvloop/httptools if installed"""
+
+    os.environ.update({name: str(value) for name, value in (settings or {}).items()})
+    options = {"host": host, "port": port, "loop": loop, "http": http,
+               "proxy_headers": proxy_headers, "log_level": log_level}
+    logger.info(f"Serving on {host}:{port} with {workers} worker(s)"
+                f"{' sharing the port via SO_REUSEPORT' if REUSE_PORT else ''}")
+    Supervisor(workers, options).run()
@@ -0,0 +1,195 @@
+"""Key-value store of targets, which don't fit the domain length limit.
+
+Targets are registered by their SHA-1 and resolved by short ID domains(`id-<16 hex>.302.MAIN_DOMAIN`)
+or silent mode error domains(`too-long-target-<sha1>.302.MAIN_DOMAIN`). The store is a SQLite file,
+so every worker process opens own connection and sees targets registered by other workers.
+Resolved targets are kept in memory, registered targets never change, so the cache isn't invalidated.
+Unknown short IDs are kept in memory for `negative_ttl` seconds, so floods of unregistered domains
+don't query SQLite on every request, targets registered by other workers are resolved after the TTL.
+"""
+import json
+import time
+import sqlite3
+import hmac
+import threading
+from collections import OrderedDict
+
+import r3dir.encoder
+from r3dir.exceptions import BaseCoderError, TooLongTarget
+
+MAX_TARGET_LENGTH = 8192
+MAX_REQUEST_SIZE = 65536
+#returned by lookup_cached() for short IDs, which have to be queried from SQLite
+NOT_CACHED = object()
+
+
+class TargetStore:
+    """SQLite store of long targets with LRU read cache and TTL cache of unknown short IDs"""
+
+    def __init__(self, path: str, cache_size: int = 4096, negative_ttl: float = 5.0):
+        self.path = path
+        self.cache_size = cache_size
+        self.negative_ttl = negative_ttl
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS targets ("
+                                "short_id TEXT PRIMARY KEY, sha1 TEXT NOT NULL, target TEXT NOT NULL"
+                                ") WITHOUT ROWID")
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._unknown = OrderedDict()
+        #lookups run in threads of the event loop executor, they share the connection and the caches
+        self._lock = threading.Lock()
+
+    def register(self, target: str) -> str:
+        """Stores the target and returns its short ID"""
+
+        sha1 = r3dir.encoder._target_hash(target)
+        short_id = sha1[:r3dir.encoder.SHORT_ID_LENGTH]
+        with self._lock:
+            self.connection.execute("INSERT OR IGNORE INTO targets VALUES (?, ?, ?)", (short_id, sha1, target))
+            self._unknown.pop(short_id, None)
+        if self.lookup(short_id) != target:
+            #64-bit prefixes of two different targets collided
+            raise ValueError(f"Short ID {short_id} is already taken by another target")
+        return short_id
+
+    def lookup(self, target_hash: str) -> str | None:
+        """Finds target by short ID or full SHA-1"""
+
+        target = self.lookup_cached(target_hash)
+        if target is not NOT_CACHED:
+            return target
+        short_id = target_hash[:r3dir.encoder.SHORT_ID_LENGTH].lower()
+        with self._lock:
+            self.misses += 1
+            row = self.connection.execute("SELECT sha1, target FROM targets WHERE short_id = ?", (short_id,)).fetchone()
+            if row is None:
+                self._store_unknown(short_id)
+                return None
+            self._store(short_id, row)
+        sha1, target = row
+        return target if sha1.startswith(target_hash.lower()) else None
+
+    def lookup_cached(self, target_hash: str) -> str | None:
+        """lookup() without SQLite queries, returns NOT_CACHED if the short ID isn't in memory"""
+
+        short_id = target_hash[:r3dir.encoder.SHORT_ID_LENGTH].lower()
+        with self._lock:
+            try:
+                sha1, target = self._entries[short_id]
+            except KeyError:
+                expires = self._unknown.get(short_id)
+                if expires is None:
+                    return NOT_CACHED
+                if expires <= time.monotonic():
+                    del self._unknown[short_id]
+                    return NOT_CACHED
+                self.hits += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(short_id)
+        return target if sha1.startswith(target_hash.lower()) else None
+
+    def resolve(self, error: TooLongTarget) -> tuple[str, int] | None:
+        """Target and status code of error or short ID domain, which raised TooLongTarget in decoder"""
+
+        if error.target_hash is None or error.status_code is None:
+            return None
+        target = self.lookup(error.target_hash)
+        return None if target is None else (target, error.status_code)
+
+    def resolve_cached(self, error: TooLongTarget) -> tuple[str, int] | None:
+        """resolve() without SQLite queries, returns NOT_CACHED if the short ID isn't in memory"""
+
+        if error.target_hash is None or error.status_code is None:
+            return None
+        target = self.lookup_cached(error.target_hash)
+        return target if target is None or target is NOT_CACHED else (target, error.status_code)
+
+    def _store(self, short_id: str, row: tuple):
+        if self.cache_size <= 0:
+            return
+        self._entries[short_id] = row
+        if len(self._entries) > self.cache_size:
+            self._entries.popitem(last=False)
+
+    def _store_unknown(self, short_id: str):
+        if self.negative_ttl <= 0 or self.cache_size <= 0:
+            return
+        self._unknown[short_id] = time.monotonic() + self.negative_ttl
+        self._unknown.move_to_end(short_id)
+        if len(self._unknown) > self.cache_size:
+            self._unknown.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM targets").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class TargetStoreMiddleware:
+    """ASGI middleware, which registers targets on `path` on any host:
+
+        POST /--register/ {"target": "http://...", "status_code": 302, "ignore_part": null}
+        -> {"short_id": "...", "domain": "id-....302.MAIN_DOMAIN"}
+
+       Requests have to carry `Authorization: Bearer <token>` header"""
+
+    def __init__(self, app, store: TargetStore, main_domain: str, token: str, path: str = "/--register/"):
+        self.app = app
+        self.store = store
+        self.main_domain = main_domain
+        self.path = path
+        self.authorization = f"Bearer {token}".encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] != "POST":
+            await _send_json(send, 405, {"error": "Method Not Allowed"}, [(b"allow", b"POST")])
+            return
+        authorization = dict(scope["headers"]).get(b"authorization", b"")
+        if not hmac.compare_digest(authorization, self.authorization):
+            await _send_json(send, 401, {"error": "Unauthorized"}, [(b"www-authenticate", b"Bearer")])
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if len(body) > MAX_REQUEST_SIZE:
+                await _send_json(send, 413, {"error": "Request body is too large"})
+                return
+
+        try:
+            request = json.loads(body)
+            target = request["target"]
+            status_code = int(request.get("status_code", 302))
+            ignore_part = request.get("ignore_part")
+            if not isinstance(target, str) or not 0 < len(target) <= MAX_TARGET_LENGTH:
+                raise ValueError(f"target should be a string up to {MAX_TARGET_LENGTH} characters")
+            if status_code not in range(200, 600):
+                raise ValueError("status_code is not in [200, 600) range")
+            domain = r3dir.encoder.short_id_domain(target, status_code, self.main_domain, ignore_part)
+            short_id = self.store.register(target)
+        except (ValueError, TypeError, KeyError, BaseCoderError) as e:
+            await _send_json(send, 400, {"error": f"{type(e).__name__}: {e}"})
+            return
+        await _send_json(send, 200, {"short_id": short_id, "domain": domain})
+
+
+async def _send_json(send, status_code: int, content: dict, headers: list = ()):
+    body = json.dumps(content).encode("utf-8")
+    await send({"type": "http.response.start", "status": status_code,
+                "headers": [(b"content-length", str(len(body)).encode("latin-1")),
+                            (b"content-type", b"application/json"), *headers]})
+    await send({"type": "http.response.body", "body": body})
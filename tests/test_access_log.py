@@ -0,0 +1,67 @@
+import io, json
+import asyncio
+import threading
+import pytest
+from r3dir.server.access_log import AccessLog
+
+class BlockingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writing = threading.Event()
+        self.unblocked = threading.Event()
+
+    def write(self, data):
+        self.writing.set()
+        self.unblocked.wait()
+        return super().write(data)
+
+def test_queue_json_records():
+    stream = io.StringIO()
+    access_log = AccessLog("queue", "json", stream=stream)
+    for i in range(100):
+        access_log.log(f"http://{i}.302.r3dir.me/", "http://localhost", 302)
+    access_log.close()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record["url"] for record in records] == [f"http://{i}.302.r3dir.me/" for i in range(100)]
+    assert records[0]["target"] == "http://localhost" and records[0]["status_code"] == 302
+    assert access_log.stats() == {"mode": "queue", "queued": 0, "written": 100, "dropped": 0}
+
+def test_queue_drops_records_when_full():
+    stream = BlockingStream()
+    access_log = AccessLog("queue", "text", queue_size=2, stream=stream)
+    access_log.log("http://302.r3dir.me/", "http://localhost", 302)
+    stream.writing.wait()
+    for _ in range(5):
+        access_log.log("http://302.r3dir.me/", "http://localhost", 302)
+    assert access_log.dropped == 3
+    stream.unblocked.set()
+    access_log.close()
+    lines = stream.getvalue().splitlines()
+    assert len([line for line in lines if line.startswith("SUCCESS:  http://302.r3dir.me/")]) == 3
+    assert "3 access log records were dropped" in lines[-1]
+
+def test_block_policy_waits_without_blocking_event_loop():
+    stream = BlockingStream()
+    access_log = AccessLog("queue", "text", queue_size=1, full_policy="block", stream=stream)
+
+    async def main():
+        await access_log.log_async("http://302.r3dir.me/", "http://localhost", 302)
+        await asyncio.get_running_loop().run_in_executor(None, stream.writing.wait)
+        await access_log.log_async("http://302.r3dir.me/", "http://localhost", 302)
+        waiting = asyncio.create_task(access_log.log_async("http://302.r3dir.me/", "http://localhost", 302))
+        #the event loop keeps running while the request waits for free space
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        stream.unblocked.set()
+        await waiting
+
+    asyncio.run(main())
+    access_log.close()
+    assert access_log.written == 3
+    assert access_log.dropped == 0
+
+def test_invalid_access_log_options():
+    with pytest.raises(ValueError):
+        AccessLog("async")
+    with pytest.raises(ValueError):
+        AccessLog("queue", full_policy="wait")
@@ -0,0 +1,71 @@
+import asyncio
+from r3dir.server.admission import RateLimiter, AdmissionMiddleware
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_token_bucket():
+    clock = Clock()
+    limiter = RateLimiter(rate=10, burst=3, clock=clock)
+    assert [limiter.acquire("192.0.2.1") for _ in range(3)] == [0, 0, 0]
+    assert abs(limiter.acquire("192.0.2.1") - 0.1) < 1e-6
+    #other clients have own buckets
+    assert limiter.acquire("192.0.2.2") == 0
+    clock.now += 0.1
+    assert limiter.acquire("192.0.2.1") == 0
+    assert limiter.acquire("192.0.2.1") > 0
+    clock.now += 0.3
+    assert [limiter.acquire("192.0.2.1") for _ in range(3)] == [0, 0, 0]
+
+def test_idle_buckets_are_evicted():
+    clock = Clock()
+    limiter = RateLimiter(rate=10, burst=3, clock=clock)
+    limiter.acquire("192.0.2.1")
+    clock.now += 0.31
+    limiter.acquire("192.0.2.2")
+    clock.now += 0.31
+    limiter.acquire("192.0.2.2")
+    assert "192.0.2.1" not in limiter.current and "192.0.2.1" not in limiter.previous
+    assert limiter.evicted == 0
+
+def test_memory_is_bounded():
+    limiter = RateLimiter(rate=1, burst=5, max_clients=100, clock=Clock())
+    for i in range(1000):
+        limiter.acquire(f"client-{i}")
+    assert len(limiter) <= 200
+    assert limiter.evicted > 0
+
+def test_admission_middleware():
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 302, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def run():
+        middleware = AdmissionMiddleware(app, RateLimiter(rate=1, burst=2, clock=Clock()), max_concurrency=1)
+        statuses = []
+
+        async def call(client):
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append((client, message["status"]))
+            await middleware({"type": "http", "client": (client, 1234)}, None, send)
+
+        first = asyncio.create_task(call("192.0.2.1"))
+        await asyncio.sleep(0)
+        await call("192.0.2.2")
+        await call("192.0.2.1")
+        await call("192.0.2.1")
+        release.set()
+        await first
+        return middleware, statuses
+
+    middleware, statuses = asyncio.run(run())
+    assert statuses == [("192.0.2.2", 503), ("192.0.2.1", 503), ("192.0.2.1", 429), ("192.0.2.1", 302)]
+    assert middleware.stats() == {"in_flight": 0, "admitted": 1, "rate_limited": 1, "overloaded": 2}
@@ -0,0 +1,77 @@
+import base64
+import random
+import binascii
+import pytest
+from r3dir import base32, encoder
+from r3dir.exceptions import Base32DecodingError
+from benchmarks import corpus
+
+#fixed seed, so failures are reproducible
+SEED = 20240501
+ALPHABET = "abcdefghijklmnopqrstuvwxyz234567"
+
+def _stdlib_encode(data: bytes, prefix: str = "", label_length: int = 63) -> str:
+    """Encoding of r3dir before base32 module: stdlib, stripped padding, lower case, chunks"""
+    string = prefix + base64.b32encode(data).decode("ascii").rstrip("=").lower()
+    return ".".join(string[i:i + label_length] for i in range(0, len(string), label_length))
+
+def _stdlib_decode(labels) -> bytes:
+    string = "".join(labels)
+    return base64.b32decode(string + "=" * (-len(string) % 8), casefold=True)
+
+def _outcome(func, *args):
+    try:
+        return func(*args)
+    except ValueError:
+        #stdlib raises plain ValueError for non-ASCII strings, base32 module raises binascii.Error for everything
+        return ValueError
+
+def test_encode_matches_stdlib():
+    rng = random.Random(SEED)
+    for size in range(300):
+        for _ in range(10):
+            data = rng.randbytes(size)
+            prefix = rng.choice(("", "1"))
+            label_length = rng.choice((63, 8, 1))
+            encoded = base32.encode_labels(data, prefix.encode(), label_length)
+            assert encoded == _stdlib_encode(data, prefix, label_length)
+            assert len(encoded.replace(".", "")) == len(prefix) + base32.encoded_length(size)
+    assert base32.encode_labels(memoryview(b"\x00\xff" * 40)) == _stdlib_encode(b"\x00\xff" * 40)
+
+def test_decode_matches_stdlib():
+    rng = random.Random(SEED)
+    for size in range(300):
+        data = rng.randbytes(size)
+        labels = _stdlib_encode(data).split(".")
+        if rng.random() < 0.5:
+            labels = [label.upper() for label in labels]
+        assert base32.decode_labels(labels) == _stdlib_decode(labels) == data
+
+def test_decode_of_malformed_labels_matches_stdlib():
+    rng = random.Random(SEED)
+    #padding characters aren't compared, generated domains never have them and the codec rejects them
+    characters = ALPHABET + ALPHABET.upper() + "0189_-+ .é\u212a\u017f"
+    for _ in range(20000):
+        string = "".join(rng.choice(characters) for _ in range(rng.randrange(30)))
+        cut = rng.randrange(len(string) + 1)
+        labels = [string[:cut], string[cut:]]
+        assert _outcome(base32.decode_labels, labels) == _outcome(_stdlib_decode, labels), labels
+
+@pytest.mark.parametrize("labels", [["a"], ["abc"], ["abcdef"], ["ab", "c"], ["a1"], ["a_b"], ["-ab"], ["ab="], ["é"],
+                                    ["\u212aaaa"], ["aa\u017faaaa"], ["\u0131a"]])
+def test_decode_errors(labels):
+    with pytest.raises(binascii.Error):
+        base32.decode_labels(labels)
+
+def test_non_ascii_case_variants_are_decoding_errors():
+    for domain in ("\u212aaaa.302.r3dir.me", "aa\u017faaaa.302.r3dir.me"):
+        with pytest.raises(Base32DecodingError):
+            encoder.decode(domain, "r3dir.me")
+
+def test_existing_domains_are_unchanged():
+    for target in corpus.TARGETS:
+        for codec in ("unishox2", "deflate"):
+            candidate = encoder.CODECS[codec]
+            expected = _stdlib_encode(candidate.compress(target), candidate.marker)
+            assert encoder._b32encode_labels(target, codec) == expected
+            assert encoder._b32decode_dns(expected.split(".")) == target
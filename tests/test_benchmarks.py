@@ -0,0 +1,41 @@
+from r3dir import encoder
+from benchmarks import corpus
+from benchmarks._utils import measure, compare
+from benchmarks.bench_load import build_requests, summarize
+
+def test_corpus_round_trip():
+    for target, domain in zip(corpus.TARGETS, corpus.DOMAINS):
+        assert encoder.decode(domain, corpus.MAIN_DOMAIN) == (target, 302)
+    assert all(len(domain) <= encoder.MAX_DOMAIN_LENGTH for domain in corpus.DOMAINS)
+
+def test_measure_reports_tracked_metrics():
+    metrics = measure(encoder.encode, [("http://localhost", 302, "r3dir.me")], min_time=0.001, rounds=1, latency_samples=10)
+    assert metrics["ops_per_sec"] > 0
+    assert metrics["p50_us"] <= metrics["p99_us"]
+
+def test_compare_with_baseline():
+    baseline = {"encode": {"ops_per_sec": 1000, "p50_us": 10}}
+    assert compare({"encode": {"ops_per_sec": 900, "p50_us": 11}}, baseline, threshold=20) == []
+    regressions = compare({"encode": {"ops_per_sec": 700, "p50_us": 10}}, baseline, threshold=20)
+    assert len(regressions) == 1 and regressions[0].startswith("encode.ops_per_sec")
+    assert compare({"decode": {"ops_per_sec": 1}}, baseline, threshold=20) == []
+
+def test_load_requests_mix():
+    requests = build_requests(corpus.MAIN_DOMAIN, {"domain": 6, "parameter": 2, "preflight": 1, "malformed": 1}, size=100)
+    counts = {}
+    for kind, request in requests:
+        counts[kind] = counts.get(kind, 0) + 1
+        assert request.endswith(b"\r\n\r\n")
+    assert counts == {"domain": 60, "parameter": 20, "preflight": 10, "malformed": 10}
+    assert all(f".{corpus.MAIN_DOMAIN}\r\n".encode() in request for _, request in requests)
+    assert requests == build_requests(corpus.MAIN_DOMAIN, {"domain": 6, "parameter": 2, "preflight": 1, "malformed": 1}, size=100)
+
+def test_load_summary():
+    results = {"kinds": {"domain": ([i / 1000 for i in range(1, 101)], {"302": 100}),
+                         "malformed": ([0.5], {"400": 1})}, "errors": []}
+    report = summarize(results, 2.0)
+    assert report["requests"] == 101 and report["requests_per_sec"] == 50.5
+    assert (report["p50_ms"], report["p99_ms"]) == (51.0, 100.0)
+    assert report["kinds"]["domain"]["p95_ms"] == 96.0
+    assert report["kinds"]["malformed"] == {"requests": 1, "requests_per_sec": 0.5, "p50_ms": 500.0, "p95_ms": 500.0,
+                                            "p99_ms": 500.0, "status_codes": {"400": 1}}
@@ -0,0 +1,58 @@
+import pytest
+from r3dir import encoder
+from r3dir.exceptions import Base32DecodingError, StatusCodeNotInRangeError, TooLongTarget
+from r3dir.server.cache import DecodeCache
+from r3dir.server.metrics import Metrics
+
+MAIN_DOMAIN = "r3dir.me"
+
+def test_cache_hit():
+    cache = DecodeCache(MAIN_DOMAIN, max_size=8)
+    encoded_domain = encoder.encode("http://169.254.169.254", 301, MAIN_DOMAIN)
+    assert cache.decode(encoded_domain) == ("http://169.254.169.254", 301)
+    assert cache.decode(encoded_domain) == ("http://169.254.169.254", 301)
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+def test_cache_negative_entry():
+    cache = DecodeCache(MAIN_DOMAIN, max_size=8)
+    for _ in range(3):
+        with pytest.raises(Base32DecodingError):
+            cache.decode("non-encoded.302.r3dir.me")
+    with pytest.raises(StatusCodeNotInRangeError):
+        cache.decode("9999.r3dir.me")
+    assert cache.hits == 2
+    assert cache.misses == 2
+    assert len(cache) == 2
+
+def test_cache_reports_cached_errors():
+    metrics = Metrics()
+    cache = DecodeCache(MAIN_DOMAIN, max_size=8, decode=metrics.decode, on_error=metrics.count_decode_error)
+    for _ in range(3):
+        with pytest.raises(Base32DecodingError):
+            cache.decode("non-encoded.302.r3dir.me")
+    assert cache.hits == 2
+    assert metrics.decode_errors == {"Base32DecodingError": 3}
+
+def test_cache_does_not_keep_too_long_target():
+    cache = DecodeCache(MAIN_DOMAIN, max_size=8)
+    with pytest.raises(TooLongTarget):
+        cache.decode("too-long-target-c1ee2cb84dee0891a3788b74cefdbb301ff8791f.301.r3dir.me")
+    assert len(cache) == 0
+
+def test_cache_lru_eviction():
+    cache = DecodeCache(MAIN_DOMAIN, max_size=2)
+    cache.decode("301.r3dir.me")
+    cache.decode("302.r3dir.me")
+    cache.decode("301.r3dir.me")
+    cache.decode("303.r3dir.me")
+    assert cache.evictions == 1
+    cache.decode("301.r3dir.me")
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 2, "misses": 3, "evictions": 1}
+
+def test_cache_disabled():
+    cache = DecodeCache(MAIN_DOMAIN, max_size=0)
+    cache.decode("301.r3dir.me")
+    cache.decode("301.r3dir.me")
+    assert len(cache) == 0
+    assert cache.misses == 2
@@ -0,0 +1,62 @@
+import io
+import sys
+import json
+import socket
+import threading
+import subprocess
+from r3dir import encoder
+from r3dir.coprocess import handle, serve_stream, serve_socket
+
+MAIN_DOMAIN = "r3dir.me"
+
+def _lines(*requests) -> bytes:
+    return b"".join(json.dumps(request).encode() + b"\n" for request in requests)
+
+def test_handle_requests():
+    domain = encoder.encode("http://localhost", 307, MAIN_DOMAIN, "x")
+    assert handle(json.dumps({"id": 1, "target": "http://localhost", "status_code": 307, "ignore_part": "x"}), MAIN_DOMAIN) == \
+        {"id": 1, "result": domain, "error": None}
+    assert handle(json.dumps({"id": "a", "op": "decode", "domain": domain}), MAIN_DOMAIN) == \
+        {"id": "a", "result": "http://localhost", "status_code": 307, "error": None}
+    assert handle(json.dumps({"target": "http://localhost", "https": True, "main_domain": "example.com"}), MAIN_DOMAIN)["result"] == \
+        encoder.encode("http://localhost", 302, "example.com", https_enforced=True)
+
+def test_handle_errors():
+    assert handle(b"{", MAIN_DOMAIN)["error"].startswith("JSONDecodeError")
+    assert handle(b"[]", MAIN_DOMAIN)["error"] == "ValueError: request must be a JSON object"
+    assert handle(b'{"id": 1}', MAIN_DOMAIN) == {"id": 1, "result": None, "error": "ValueError: missing field: target"}
+    assert handle(b'{"op": "x"}', MAIN_DOMAIN)["error"] == "ValueError: unknown op: x"
+    assert handle(b'{"target": "http://a", "codec": "x"}', MAIN_DOMAIN)["error"] == "ValueError: unknown codec: x"
+    response = handle(b'{"op": "decode", "domain": "aaa.999.r3dir.me"}', MAIN_DOMAIN)
+    assert response["status_code"] is None and response["error"].startswith("StatusCodeNotInRangeError")
+
+def test_serve_stream_answers_in_order():
+    output = io.BytesIO()
+    serve_stream(io.BytesIO(_lines({"id": 1, "target": "http://a"}, {"id": 2}) + b"\n" + _lines({"id": 3, "target": "http://b"})),
+                 output, MAIN_DOMAIN)
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [response["id"] for response in responses] == [1, 2, 3]
+    assert responses[2]["result"] == encoder.encode("http://b", 302, MAIN_DOMAIN)
+
+def test_serve_socket(tmp_path):
+    path = str(tmp_path / "r3dir.sock")
+    threading.Thread(target=serve_socket, args=(path, MAIN_DOMAIN), daemon=True).start()
+    for _ in range(100):
+        try:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(path)
+            break
+        except OSError:
+            threading.Event().wait(0.05)
+    with client, client.makefile("rwb") as stream:
+        stream.write(_lines({"id": 1, "target": "http://a"}, {"id": 2, "op": "decode", "domain": "x"}))
+        stream.flush()
+        assert json.loads(stream.readline())["result"] == encoder.encode("http://a", 302, MAIN_DOMAIN)
+        assert json.loads(stream.readline())["error"].startswith("WrongEncodedURLFormat")
+
+def test_cli_imports_only_encoder():
+    modules = subprocess.run([sys.executable, "-c", "import sys, r3dir._cli; print(' '.join(sys.modules))"],
+                             capture_output=True, text=True, check=True).stdout.split()
+    assert "r3dir.encoder" in modules
+    for module in ("r3dir.client", "r3dir.permutations", "urllib.request", "pyperclip", "pprint", "csv", "hashlib"):
+        assert module not in modules
@@ -0,0 +1,82 @@
+import asyncio
+import struct
+from r3dir import encoder
+from r3dir.server import dns
+
+MAIN_DOMAIN = "r3dir.me"
+ENCODED_HOST = encoder.encode("http://169.254.169.254/latest/meta-data", 302, MAIN_DOMAIN)
+
+def _responder():
+    return dns.DNSResponder(MAIN_DOMAIN, ["203.0.113.10"], ["2001:db8::1"], ttl=60)
+
+def _rcode(response):
+    return dns.HEADER.unpack_from(response)[1] & 0xF
+
+def test_valid_hosts():
+    assert dns.is_valid_host(ENCODED_HOST, MAIN_DOMAIN)
+    assert dns.is_valid_host(f"ignored.--.{ENCODED_HOST}", MAIN_DOMAIN)
+    assert dns.is_valid_host(f"307.{MAIN_DOMAIN}", MAIN_DOMAIN)
+    assert dns.is_valid_host(MAIN_DOMAIN, MAIN_DOMAIN)
+    assert dns.is_valid_host(f"too-long-target-c1ee2cb84dee0891a3788b74cefdbb301ff8791f.301.{MAIN_DOMAIN}", MAIN_DOMAIN)
+    assert not dns.is_valid_host(f"non-encoded.302.{MAIN_DOMAIN}", MAIN_DOMAIN)
+    assert not dns.is_valid_host(f"abc.302.{MAIN_DOMAIN}", MAIN_DOMAIN)
+    assert not dns.is_valid_host(f"9999.{MAIN_DOMAIN}", MAIN_DOMAIN)
+    assert not dns.is_valid_host(f"www.{MAIN_DOMAIN}", MAIN_DOMAIN)
+
+def test_a_answer_keeps_question_case():
+    query = dns.build_query(ENCODED_HOST.upper(), dns.TYPE_A, query_id=0x1234)
+    response = _responder().handle(query)
+    query_id, flags, qdcount, ancount, nscount, _ = dns.HEADER.unpack_from(response)
+    assert (query_id, qdcount, ancount, nscount) == (0x1234, 1, 1, 0)
+    assert flags & dns.FLAG_AA and flags & dns.FLAG_QR and flags & dns.FLAG_RD
+    assert response[12:len(query)] == query[12:]
+    assert response.endswith(struct.pack("!HHIH", dns.TYPE_A, dns.CLASS_IN, 60, 4) + bytes((203, 0, 113, 10)))
+
+def test_aaaa_answer():
+    response = _responder().handle(dns.build_query(ENCODED_HOST, dns.TYPE_AAAA))
+    assert dns.HEADER.unpack_from(response)[3] == 1
+    assert response.endswith(bytes.fromhex("20010db8000000000000000000000001"))
+
+def test_rejected_queries():
+    responder = _responder()
+    assert _rcode(responder.handle(dns.build_query(f"non-encoded.302.{MAIN_DOMAIN}"))) == dns.RCODE_NXDOMAIN
+    assert _rcode(responder.handle(dns.build_query("example.com"))) == dns.RCODE_REFUSED
+    assert _rcode(responder.handle(dns.build_query(ENCODED_HOST)[:-3])) == dns.RCODE_FORMERR
+    assert responder.handle(b"\x00") is None
+    assert responder.rejected == 2
+
+def test_nodata_with_soa():
+    response = _responder().handle(dns.build_query(ENCODED_HOST, 16))
+    _, flags, _, ancount, nscount, _ = dns.HEADER.unpack_from(response)
+    assert (flags & 0xF, ancount, nscount) == (dns.RCODE_NOERROR, 0, 1)
+
+def test_udp_and_tcp_server():
+    async def run():
+        server = await dns.start_dns_server(MAIN_DOMAIN, ["203.0.113.10"], [], host="127.0.0.1", port=0)
+        udp_port = server.udp_transport.get_extra_info("sockname")[1]
+        tcp_port = server.tcp_server.sockets[0].getsockname()[1]
+        query = dns.build_query(ENCODED_HOST, query_id=7)
+
+        loop = asyncio.get_running_loop()
+        received = loop.create_future()
+
+        class Client(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                received.set_result(data)
+
+        transport, _ = await loop.create_datagram_endpoint(Client, remote_addr=("127.0.0.1", udp_port))
+        transport.sendto(query)
+        udp_response = await asyncio.wait_for(received, 5)
+        transport.close()
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", tcp_port)
+        writer.write(struct.pack("!H", len(query)) + query)
+        length, = struct.unpack("!H", await reader.readexactly(2))
+        tcp_response = await reader.readexactly(length)
+        writer.close()
+        server.close()
+        return udp_response, tcp_response
+
+    udp_response, tcp_response = asyncio.run(run())
+    assert udp_response == tcp_response
+    assert dns.HEADER.unpack_from(udp_response)[3] == 1
@@ -1,5 +1,8 @@
+import sys
 import pytest
+import zlib
 from r3dir import encoder
+from r3dir._cli import _cli
 from r3dir.exceptions import Base32DecodingError, StatusCodeNotInRangeError, WrongEncodedURLFormat, TooLongTarget
 
 def test_valid_target():
@@ -61,24 +64,24 @@ def test_encoder_too_long_target():
     main_domain = "r3dir.me"
     target, status_code = "gopher://metadata.google.internal:80/xGET%20/computeMetadata/v1/instance/attributes/ssh-keys%20HTTP%2f%31%2e%31%0AHost:%20metadata.google.internal%0AAccept:%20%2a%2f%2a%0aMetadata-Flavor:%20Google%0d%0aTestHeader:%20Google", 301
     with pytest.raises(TooLongTarget):
-        encoded_domain = encoder.encode(target, status_code=status_code, main_domain=main_domain, https_enforced=False)
+        encoded_domain = encoder.encode(target, status_code=status_code, main_domain=main_domain, https_enforced=False, codec="unishox2")
 
 def test_encoder_too_long_target_with_https_enforced():
     main_domain = "r3dir.me"
     target, status_code = "gopher://metadata.google.internal:80/xGET%20/computeMetadata/v1/instance/attributes/ssh-keys%20HTTP%2f%31%2e%31%0A", 301
     with pytest.raises(TooLongTarget):
-        encoded_domain = encoder.encode(target, status_code=status_code, main_domain=main_domain, https_enforced=True)
+        encoded_domain = encoder.encode(target, status_code=status_code, main_domain=main_domain, https_enforced=True, codec="unishox2")
 
 def test_encoder_too_long_target_with_https_enforced_with_slient_mode():
     main_domain = "r3dir.me"
     target, status_code = "gopher://metadata.google.internal:80/xGET%20/computeMetadata/v1/instance/attributes/ssh-keys%20HTTP%2f%31%2e%31%0A", 301
-    encoded_domain = encoder.encode(target, status_code=status_code, main_domain=main_domain, https_enforced=True, slient_mode=True)
+    encoded_domain = encoder.encode(target, status_code=status_code, main_domain=main_domain, https_enforced=True, slient_mode=True, codec="unishox2")
     assert "too-long-target-" in encoded_domain
 
 def test_encoder_too_long_target_with_slient_mode():
     main_domain = "r3dir.me"
     target, status_code = "gopher://metadata.google.internal:80/xGET%20/computeMetadata/v1/instance/attributes/ssh-keys%20HTTP%2f%31%2e%31%0AHost:%20metadata.google.internal%0AAccept:%20%2a%2f%2a%0aMetadata-Flavor:%20Google%0d%0aTestHeader:%20Google", 301
-    encoded_domain = encoder.encode(target, status_code=status_code, main_domain=main_domain, https_enforced=False, slient_mode=True)
+    encoded_domain = encoder.encode(target, status_code=status_code, main_domain=main_domain, https_enforced=False, slient_mode=True, codec="unishox2")
     assert "too-long-target-" in encoded_domain
 
 def test_decoder_too_long_target():
@@ -98,7 +101,7 @@ def test_encoder_too_long_target_with_ignore_part():
     main_domain = "r3dir.me"
     target, status_code = "gopher://metadata.google.internal:80/xGET%20/computeMetadata/v1/instance/attributes/ssh-keys%20HTTP%2f%31%2e%31%0AHost:%20metadata.google.internal%0AAccept:%20%2a%2f%2a%0aMetadata-Flavor:%20Google%0d%0a", 301
     with pytest.raises(TooLongTarget):
-        encoded_domain = encoder.encode(target, status_code=status_code, ignore_part=ignore_part, main_domain=main_domain, https_enforced=False)
+        encoded_domain = encoder.encode(target, status_code=status_code, ignore_part=ignore_part, main_domain=main_domain, https_enforced=False, codec="unishox2")
 
 def test_decoder_status_code_out_of_range():
     main_domain = "r3dir.me"
@@ -169,4 +172,75 @@ def test_decoder_splitted_encoded_subdomains():
     encoded_domain = '62epax5fhv.j3zzmzie.301.r3dir.me'
     decoded_target, decoded_code = encoder.decode(encoded_domain, main_domain=main_domain)
     assert target == decoded_target
-    assert status_code == decoded_code
\ No newline at end of file
+    assert status_code == decoded_code
+
+
+def test_encode_many_and_decode_many():
+    main_domain = "r3dir.me"
+    targets = ["http://169.254.169.254", "http://localhost", "gopher://metadata.google.internal:80/xGET%20/computeMetadata/v1/instance/attributes/ssh-keys%20HTTP%2f%31%2e%31%0A"]
+    results = list(encoder.encode_many(iter(targets), 301, main_domain, https_enforced=True, codec="unishox2"))
+    assert [result.item for result in results] == targets
+    assert isinstance(results[2].error, TooLongTarget)
+    decoded = list(encoder.decode_many([result.result for result in results[:2]] + ["non-encoded.302.r3dir.me"], main_domain))
+    assert [result.result for result in decoded[:2]] == [(target, 301) for target in targets[:2]]
+    assert isinstance(decoded[2].error, Base32DecodingError)
+
+def test_encode_many_with_process_pool():
+    main_domain = "r3dir.me"
+    targets = [f"http://10.0.0.{i}" for i in range(50)]
+    pooled = list(encoder.encode_many(targets, 302, main_domain, processes=2, chunksize=4))
+    assert pooled == list(encoder.encode_many(targets, 302, main_domain))
+
+def test_cli_rejects_target_with_from_file(monkeypatch, capsys, tmp_path):
+    (tmp_path / "targets.txt").write_text("http://localhost\n")
+    for argv in (["encode", "http://a", "-f"], ["decode", "302.r3dir.me", "-f"]):
+        monkeypatch.setattr(sys, "argv", ["r3dir", *argv, str(tmp_path / "targets.txt")])
+        with pytest.raises(SystemExit) as e:
+            _cli()
+        assert e.value.code == 2
+        assert "not allowed with argument" in capsys.readouterr().err
+
+def test_codecs_round_trip():
+    main_domain = "r3dir.me"
+    for target in ["http://169.254.169.254/latest/meta-data", "http://пример.рф/путь", "http://0x7f000001", ""]:
+        for codec in ("auto", "unishox2", "deflate"):
+            encoded_domain = encoder.encode(target, status_code=302, main_domain=main_domain, codec=codec)
+            assert encoder.decode(encoded_domain, main_domain=main_domain) == (target, 302)
+
+def test_auto_codec_picks_shortest():
+    target = "http://169.254.169.254/latest/meta-data/iam/security-credentials/"
+    encoded = {codec: "".join(encoder._b32encode_dns(target, codec)) for codec in ("auto", "unishox2", "deflate")}
+    assert encoded["deflate"].startswith("1")
+    assert encoded["auto"] == min(encoded["unishox2"], encoded["deflate"], key=len)
+
+def test_deflate_codec_extends_https_limit():
+    main_domain = "r3dir.me"
+    target = "gopher://metadata.google.internal:80/xGET%20/computeMetadata/v1/instance/attributes/ssh-keys%20HTTP%2f%31%2e%31%0A"
+    encoded_domain = encoder.encode(target, status_code=301, main_domain=main_domain, https_enforced=True)
+    assert encoder.decode(encoded_domain, main_domain=main_domain) == (target, 301)
+
+def test_deflate_codec_matches_default_window():
+    dictionary = encoder.SSRF_DICTIONARY_V1
+    targets = ["http://169.254.169.254/latest/meta-data/iam/security-credentials/admin",
+               "gopher://127.0.0.1:6379/_INFO%0d%0a" * 20, dictionary.decode("ascii")[::-1], "http://пример.рф/путь"]
+    for target in targets:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 8, zlib.Z_DEFAULT_STRATEGY, dictionary)
+        expected = compressor.compress(target.encode("utf-8")) + compressor.flush()
+        assert encoder.CODECS["deflate"].compress(target) == expected
+
+def test_encoder_incompressible_too_long_target():
+    main_domain = "r3dir.me"
+    target = "http://10.12.34.56:8443/internal/reports/2023/quarterly-summary.pdf?session=5f4dcc3b5aa765d61d8327deb882cf99"
+    with pytest.raises(TooLongTarget):
+        encoder.encode(target, status_code=301, main_domain=main_domain, https_enforced=True)
+
+def test_decoder_unknown_codec_marker():
+    main_domain = "r3dir.me"
+    with pytest.raises(Base32DecodingError):
+        encoder.decode("0ynxaaaa.302.r3dir.me", main_domain=main_domain)
+
+def test_decoder_truncated_deflate_target():
+    main_domain = "r3dir.me"
+    encoded_domain = encoder.encode("http://localhost:8080/admin/api/v1/users", status_code=302, main_domain=main_domain, codec="deflate")
+    with pytest.raises(Base32DecodingError):
+        encoder.decode(encoded_domain[:6] + encoded_domain[10:], main_domain=main_domain)
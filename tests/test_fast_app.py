@@ -0,0 +1,90 @@
+import os
+import asyncio
+import pytest
+
+os.environ.setdefault("MAIN_DOMAIN", "r3dir.me")
+
+from r3dir import encoder
+from r3dir.server import app as server_app
+
+MAIN_DOMAIN = server_app.MAIN_DOMAIN
+ENCODED_HOST = encoder.encode("http://169.254.169.254/latest/meta-data", 302, MAIN_DOMAIN)
+UNICODE_HOST = encoder.encode("http://пример.рф/path?q=1 2", 307, MAIN_DOMAIN)
+NO_BODY_HOST = encoder.encode("http://localhost", 304, MAIN_DOMAIN)
+TOO_LONG_HOST = f"too-long-target-c1ee2cb84dee0891a3788b74cefdbb301ff8791f.301.{MAIN_DOMAIN}"
+
+CASES = [
+    ("GET", "/", ENCODED_HOST, [], b""),
+    ("HEAD", "/some/path", ENCODED_HOST, [], b"a=b"),
+    ("POST", "/", UNICODE_HOST, [], b""),
+    ("GET", "/", NO_BODY_HOST, [], b""),
+    ("GET", "/", ENCODED_HOST.upper(), [], b""),
+    ("GET", "/", f"{ENCODED_HOST}:8080", [], b""),
+    ("GET", "/", f"ignored.part.--.{ENCODED_HOST}", [], b""),
+    ("GET", "/", f"non-encoded.302.{MAIN_DOMAIN}", [], b""),
+    ("GET", "/", f"9999.{MAIN_DOMAIN}", [], b""),
+    ("GET", "/", TOO_LONG_HOST, [], b""),
+    ("GET", "/", "evil.example.com", [], b""),
+    ("GET", "/", None, [], b""),
+    ("GET", "/", f"user@{ENCODED_HOST}", [], b""),
+    ("GET", "/", f"[::1].{MAIN_DOMAIN}", [], b""),
+    ("GET", "/a\nb", ENCODED_HOST, [], b""),
+    ("OPTIONS", "/", ENCODED_HOST, [], b""),
+    ("TRACE", "/--to/", ENCODED_HOST, [], b""),
+    ("GET", "/--to/", f"307.{MAIN_DOMAIN}", [], b"url=http://localhost"),
+    ("GET", "/--to/", f"a.--.301.{MAIN_DOMAIN}", [], b"url=http://a&url=http%3A%2F%2Fb%0A"),
+    ("GET", "/--to/", f"307.{MAIN_DOMAIN}", [], b"target=http://localhost"),
+    ("GET", "/--to/", f"non-encoded.307.{MAIN_DOMAIN}", [], b"url=http://localhost"),
+    ("GET", "/--to", f"307.{MAIN_DOMAIN}", [], b"url=http://localhost"),
+    ("GET", "/--to/", f"307.{MAIN_DOMAIN}", [], "url=http://ö".encode("latin-1")),
+    ("GET", "/", ENCODED_HOST, [(b"origin", b"http://evil.com")], b""),
+    ("GET", "/", f"bad.302.{MAIN_DOMAIN}", [(b"origin", b"http://evil.com")], b""),
+    ("DELETE", "/", "evil.example.com", [(b"origin", b"http://evil.com")], b""),
+    ("OPTIONS", "/", ENCODED_HOST, [(b"origin", b"http://evil.com"), (b"access-control-request-method", b"PUT")], b""),
+    ("OPTIONS", "/--to/", ENCODED_HOST, [(b"origin", b"null"), (b"access-control-request-method", b"CONNECT"),
+                                         (b"access-control-request-headers", b"X-Custom, Authorization")], b""),
+    ("OPTIONS", "/", ENCODED_HOST, [(b"origin", b"http://evil.com")], b""),
+]
+
+async def _call(app, scope):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        pass
+    start, body = messages
+    headers = [(key, set(value.split(b", ")) if key == b"allow" else value) for key, value in start["headers"]]
+    return start["status"], headers, body["body"]
+
+def _scope(method, path, host, headers, query_string):
+    if host is not None:
+        headers = [(b"host", host.encode("latin-1"))] + headers
+    return {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http",
+            "method": method, "path": path, "raw_path": path.encode(), "root_path": "",
+            "query_string": query_string, "headers": headers, "server": ("127.0.0.1", 80), "client": ("127.0.0.1", 1234)}
+
+@pytest.mark.parametrize("method, path, host, headers, query_string", CASES)
+def test_fast_app_parity(method, path, host, headers, query_string):
+    expected = asyncio.run(_call(server_app.starlette_app, _scope(method, path, host, headers, query_string)))
+    actual = asyncio.run(_call(server_app.fast_app, _scope(method, path, host, headers, query_string)))
+    assert actual == expected
+
+def test_fast_app_lifespan():
+    messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    asyncio.run(server_app.fast_app({"type": "lifespan", "asgi": {"version": "3.0"}}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
@@ -0,0 +1,22 @@
+import json
+import shutil
+import subprocess
+import pytest
+from r3dir import encoder
+from r3dir._cli import hackvertor_encoder
+
+MAIN_DOMAIN = "r3dir.me"
+TARGET = "http://169.254.169.254/latest/meta-data"
+
+def _js_decode(domain: str) -> str:
+    script = (f"const r3dir = require({json.dumps(hackvertor_encoder)});\n"
+              f"try {{ console.log(JSON.stringify(r3dir.decode({json.dumps(domain)}, {json.dumps(MAIN_DOMAIN)}))); }}\n"
+              f"catch (e) {{ console.log(e.message); }}")
+    return subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout.strip()
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="Node.js is not installed")
+def test_js_decoder_codecs():
+    assert json.loads(_js_decode(encoder.encode(TARGET, 302, MAIN_DOMAIN, codec="unishox2"))) == [TARGET, 302]
+    deflate_domain = encoder.encode(TARGET, 302, MAIN_DOMAIN, codec="deflate")
+    assert _js_decode(deflate_domain).startswith("Unsupported codec marker '1'")
+    assert _js_decode(f"some.--.{deflate_domain}").startswith("Unsupported codec marker '1'")
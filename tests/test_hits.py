@@ -0,0 +1,83 @@
+import json
+import asyncio
+import threading
+from r3dir import encoder
+from r3dir.server import hits
+from r3dir.server.hits import HitLog, HitLogMiddleware
+
+MAIN_DOMAIN = "r3dir.me"
+ENCODED_HOST = encoder.encode("http://169.254.169.254/latest/meta-data", 302, MAIN_DOMAIN)
+
+def _scope(host: str, path: str = "/", user_agent: bytes = b"curl/8.0") -> dict:
+    return {"type": "http", "method": "GET", "path": path, "client": ("192.0.2.1", 40000),
+            "headers": [(b"host", host.encode()), (b"user-agent", user_agent)]}
+
+def test_record_and_query(tmp_path):
+    hit_log = HitLog(str(tmp_path / "hits.db"), flush_interval=60)
+    hit_log.record(_scope(ENCODED_HOST.upper() + ":8080", "/latest"), "http://169.254.169.254/latest/meta-data", 302)
+    hit_log.record(_scope(f"other.--.{ENCODED_HOST}"), "http://169.254.169.254/latest/meta-data", 302)
+    assert hit_log.stats()["buffered"] == 2
+
+    found = hit_log.query(host=ENCODED_HOST)
+    assert hit_log.stats() == {"buffered": 0, "written": 2, "dropped": 0}
+    assert len(found) == 1
+    assert found[0]["client"] == "192.0.2.1"
+    assert found[0]["path"] == "/latest"
+    assert found[0]["user_agent"] == "curl/8.0"
+    assert found[0]["status_code"] == 302
+
+    timestamp = found[0]["time"]
+    assert len(hit_log.query(since=timestamp)) == 2
+    assert hit_log.query(until=timestamp) == []
+    assert len(hit_log.query(limit=-1)) == 1
+    hit_log.close()
+
+    #hits are kept in the file
+    assert len(hits.query(hits.connect_readonly(str(tmp_path / "hits.db")), host=ENCODED_HOST)) == 1
+
+def test_ring_buffer_overwrites_oldest(tmp_path):
+    hit_log = HitLog(str(tmp_path / "hits.db"), buffer_size=2, flush_interval=60)
+    for path in ("/1", "/2", "/3"):
+        hit_log.record(_scope(ENCODED_HOST, path), "http://localhost", 302)
+    assert [hit["path"] for hit in hit_log.query()] == ["/3", "/2"]
+    assert hit_log.dropped == 1
+    hit_log.close()
+
+def test_queries_use_indexes(tmp_path):
+    hit_log = HitLog(str(tmp_path / "hits.db"))
+    for host, since in ((ENCODED_HOST, None), (None, 0.0)):
+        plan = hit_log._connection.execute("EXPLAIN QUERY PLAN SELECT * FROM hits WHERE "
+                                           + ("host = ? ORDER BY time DESC" if host else "time >= ? ORDER BY time DESC"),
+                                           (host or since,)).fetchall()
+        assert "USING INDEX" in str(plan)
+    hit_log.close()
+
+def test_hits_endpoint(tmp_path):
+    hit_log = HitLog(str(tmp_path / "hits.db"), flush_interval=60)
+    hit_log.record(_scope(ENCODED_HOST), "http://169.254.169.254/latest/meta-data", 302)
+    middleware = HitLogMiddleware(None, hit_log, "/--hits/", "secret")
+
+    def call(query_string: bytes, headers: list):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+        scope = {"type": "http", "method": "GET", "path": "/--hits/", "query_string": query_string, "headers": headers}
+        asyncio.run(middleware(scope, None, send))
+        return messages[0]["status"], json.loads(messages[1]["body"])
+
+    assert call(b"", [])[0] == 401
+    assert call(b"", [(b"authorization", b"Bearer wrong")])[0] == 401
+    assert call(b"since=yesterday", [(b"authorization", b"Bearer secret")])[0] == 400
+    assert call(b"limit=-1", [(b"authorization", b"Bearer secret")]) == (400, {"error": "ValueError: limit should be positive"})
+    assert call(b"limit=0", [(b"authorization", b"Bearer secret")])[0] == 400
+    status_code, response = call(f"host={ENCODED_HOST}&limit=10".encode(), [(b"authorization", b"Bearer secret")])
+    assert status_code == 200
+    assert [hit["target"] for hit in response["hits"]] == ["http://169.254.169.254/latest/meta-data"]
+
+    #the query doesn't run on the event loop thread
+    query, threads = hit_log.query, []
+    hit_log.query = lambda *args: threads.append(threading.current_thread()) or query(*args)
+    assert call(b"", [(b"authorization", b"Bearer secret")])[0] == 200
+    assert threads and threads[0] is not threading.main_thread()
+    hit_log.close()
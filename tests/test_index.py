@@ -0,0 +1,46 @@
+import pytest
+from r3dir import encoder
+from r3dir.index import EncodingIndex, build_index
+from benchmarks import corpus
+
+MAIN_DOMAIN = "r3dir.me"
+TARGETS = corpus.TARGETS + corpus.TOO_LONG_TARGETS
+
+def test_index_domains_match_encode_many(tmp_path):
+    path = str(tmp_path / "targets.idx")
+    assert build_index(TARGETS + TARGETS[:3], path) == {"entries": len(TARGETS), "reused": 0, "encoded": len(TARGETS)}
+    with EncodingIndex(path) as index:
+        assert len(index) == len(TARGETS)
+        for options in ({"status_code": 307, "main_domain": "example.com"},
+                        {"status_code": 302, "main_domain": MAIN_DOMAIN, "ignore_part": "allowed.host"},
+                        {"status_code": 200, "main_domain": MAIN_DOMAIN, "https_enforced": True, "slient_mode": True}):
+            indexed = [(item, result, repr(error)) for item, result, error in index.domains(**options)]
+            encoded = [(item, result, repr(error)) for item, result, error in encoder.encode_many(TARGETS, **options)]
+            assert indexed == encoded
+
+def test_index_lookup(tmp_path):
+    path = str(tmp_path / "targets.idx")
+    build_index(TARGETS, path, codec="unishox2")
+    with EncodingIndex(path) as index:
+        assert index.codec == "unishox2"
+        for target in TARGETS:
+            assert index.lookup(target) == ".".join(encoder._b32encode_dns(target, "unishox2"))
+        assert index.lookup("http://not.indexed") is None
+
+def test_index_incremental_update(tmp_path):
+    path = str(tmp_path / "targets.idx")
+    build_index(TARGETS[:10], path)
+    assert build_index(TARGETS[5:15], path) == {"entries": 10, "reused": 5, "encoded": 5}
+    with EncodingIndex(path) as index:
+        assert [target for target, _ in index] == TARGETS[5:15]
+    #encoded subdomains of another codec aren't reused
+    assert build_index(TARGETS[5:15], path, codec="deflate")["reused"] == 0
+
+def test_index_empty_and_invalid(tmp_path):
+    path = str(tmp_path / "targets.idx")
+    build_index([], path)
+    with EncodingIndex(path) as index:
+        assert len(index) == 0 and index.lookup("http://localhost") is None
+    (tmp_path / "wordlist.txt").write_text("http://localhost\n")
+    with pytest.raises(ValueError):
+        EncodingIndex(str(tmp_path / "wordlist.txt"))
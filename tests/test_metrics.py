@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from r3dir import encoder
+from r3dir.exceptions import Base32DecodingError, TooLongTarget
+from r3dir.server.metrics import Histogram, Metrics, MetricsMiddleware
+
+MAIN_DOMAIN = "r3dir.me"
+
+def test_instrumented_decode():
+    metrics = Metrics()
+    encoded_domain = encoder.encode("http://169.254.169.254", 301, MAIN_DOMAIN)
+    assert metrics.decode(encoded_domain, MAIN_DOMAIN) == encoder.decode(encoded_domain, MAIN_DOMAIN)
+    with pytest.raises(Base32DecodingError):
+        metrics.decode("non-encoded.302.r3dir.me", MAIN_DOMAIN)
+    with pytest.raises(TooLongTarget):
+        metrics.decode("too-long-target-c1ee2cb84dee0891a3788b74cefdbb301ff8791f.301.r3dir.me", MAIN_DOMAIN)
+    #unresolved TooLongTarget errors are counted by DecodeCache
+    assert metrics.decode_errors == {"Base32DecodingError": 1}
+    assert metrics.stages["parse"].count == 2
+    assert metrics.stages["decompress"].count == 1
+
+def test_histogram_render():
+    metrics = Metrics()
+    metrics.observe_stage("parse", 0.000003)
+    metrics.observe_stage("parse", 2.0)
+    rendered = metrics.render()
+    assert f'r3dir_stage_duration_seconds_bucket{{worker="{metrics.worker}",stage="parse",le="5e-06"}} 1' in rendered
+    assert f'r3dir_stage_duration_seconds_bucket{{worker="{metrics.worker}",stage="parse",le="+Inf"}} 2' in rendered
+    assert Histogram().counts == [0] * 20
+
+def test_metrics_middleware():
+    metrics = Metrics()
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 302, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def call(path):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+        await MetricsMiddleware(app, metrics, "/--metrics")({"type": "http", "path": path}, None, send)
+        return messages
+
+    asyncio.run(call("/"))
+    asyncio.run(call("/--to/"))
+    messages = asyncio.run(call("/--metrics"))
+    assert messages[0]["status"] == 200
+    body = messages[1]["body"].decode()
+    assert 'route="domain",status="302"} 1' in body
+    assert 'route="parameter",status="302"} 1' in body
@@ -0,0 +1,115 @@
+import os
+import asyncio
+import pytest
+
+os.environ.setdefault("MAIN_DOMAIN", "r3dir.me")
+
+from r3dir import encoder
+from r3dir.server import app as server_app
+from r3dir.server.payloads import PayloadStore, send_payload, CHUNK_SIZE
+from tests.test_fast_app import _scope
+
+MAIN_DOMAIN = server_app.MAIN_DOMAIN
+LARGE_PAYLOAD = bytes(range(256)) * 600
+
+async def _call(app, scope):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages
+
+def _response(messages):
+    start, *bodies = messages
+    return start["status"], start["headers"], b"".join(body["body"] for body in bodies)
+
+@pytest.fixture
+def payloads(tmp_path):
+    (tmp_path / "xss.svg").write_bytes(b"<svg onload=alert(1)>")
+    (tmp_path / "aws").mkdir()
+    (tmp_path / "aws" / "credentials.json").write_bytes(b'{"AccessKeyId": "AKIA"}')
+    (tmp_path / "large.bin").write_bytes(LARGE_PAYLOAD)
+    store = PayloadStore(str(tmp_path), max_cached_bytes=1024)
+    yield store
+    store.close()
+
+def test_store_scan(payloads, tmp_path):
+    assert len(payloads) == 3
+    assert payloads.get("xss.svg").body == b"<svg onload=alert(1)>"
+    assert payloads.get("xss.svg").content_type == b"image/svg+xml"
+    assert payloads.get("aws/credentials.json").content_type == b"application/json"
+    assert payloads.get("large.bin").body is None
+    assert payloads.get("large.bin").size == len(LARGE_PAYLOAD)
+    assert payloads.get("missing") is None
+    assert payloads.get("../xss.svg") is None
+
+    cached = payloads.get("xss.svg")
+    (tmp_path / "xss.svg").write_bytes(b"<svg onload=alert(2)>")
+    os.utime(tmp_path / "xss.svg", ns=(0, 0))
+    (tmp_path / "new.html").write_bytes(b"<script>alert(3)</script>")
+    payloads.scan()
+    assert payloads.get("xss.svg").body == b"<svg onload=alert(2)>"
+    assert payloads.get("new.html").content_type == b"text/html; charset=utf-8"
+    assert payloads.get("aws/credentials.json") is not None
+
+    reloads = payloads.reloads
+    unchanged = payloads.get("aws/credentials.json")
+    payloads.scan()
+    assert payloads.reloads == reloads
+    assert payloads.get("aws/credentials.json") is unchanged
+    assert payloads.get("xss.svg") is not cached
+
+def test_total_cached_bytes_limit(tmp_path):
+    for name in ("a.bin", "b.bin", "c.bin"):
+        (tmp_path / name).write_bytes(b"x" * 400)
+    store = PayloadStore(str(tmp_path), max_cached_bytes=1024, max_total_cached_bytes=1000)
+    assert sorted(payload.body is not None for payload in store._payloads.values()) == [False, True, True]
+    assert store.cached_bytes == 800
+
+    os.remove(next(payload.path for payload in store._payloads.values() if payload.body is not None))
+    store.scan()
+    assert all(payload.body is not None for payload in store._payloads.values())
+    assert store.cached_bytes == 800
+    store.close()
+
+def test_payload_name(payloads):
+    assert payloads.payload_name("payload:xss.svg", 200) == "xss.svg"
+    assert payloads.payload_name("payload:xss.svg", 302) is None
+    assert payloads.payload_name("http://localhost", 200) is None
+
+def test_send_payload(payloads):
+    messages = asyncio.run(_call(lambda scope, receive, send: send_payload(scope, send, payloads.get("large.bin"), 500), {}))
+    assert len(messages) == 1 + -(-len(LARGE_PAYLOAD) // CHUNK_SIZE)
+    assert _response(messages) == (500, [(b"content-length", str(len(LARGE_PAYLOAD)).encode()),
+                                         (b"content-type", b"application/octet-stream")], LARGE_PAYLOAD)
+
+    scope = {"extensions": {"http.response.pathsend": {}}}
+    messages = asyncio.run(_call(lambda scope, receive, send: send_payload(scope, send, payloads.get("large.bin"), 200), scope))
+    assert messages[1] == {"type": "http.response.pathsend", "path": payloads.get("large.bin").path}
+
+    messages = asyncio.run(_call(lambda scope, receive, send: send_payload(scope, send, payloads.get("xss.svg"), 204), {}))
+    assert _response(messages) == (204, [], b"")
+
+@pytest.mark.parametrize("target, code, extra_headers", [
+    ("payload:xss.svg", 200, []),
+    ("payload:aws/credentials.json", 200, [(b"origin", b"http://evil.com")]),
+    ("payload:large.bin", 500, []),
+    ("payload:missing", 200, []),
+    ("payload:xss.svg", 204, []),
+    ("payload:xss.svg", 302, []),
+    ("http://localhost/", 200, []),
+])
+def test_payload_parity(payloads, monkeypatch, target, code, extra_headers):
+    monkeypatch.setattr(server_app, "payloads", payloads)
+    monkeypatch.setattr(server_app.fast_app, "payloads", payloads)
+    host = encoder.encode(target, code, MAIN_DOMAIN)
+    expected = _response(asyncio.run(_call(server_app.starlette_app, _scope("GET", "/", host, extra_headers, b""))))
+    actual = _response(asyncio.run(_call(server_app.fast_app, _scope("GET", "/", host, extra_headers, b""))))
+    assert actual == expected
+    if target.startswith("payload:") and code != 302:
+        assert b"location" not in dict(actual[1])
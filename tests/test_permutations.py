@@ -0,0 +1,72 @@
+from unittest import mock
+from r3dir import encoder, permutations
+from r3dir.permutations import permute, target_variants
+
+MAIN_DOMAIN = "r3dir.me"
+
+def test_ipv4_variants():
+    variants = list(target_variants("http://127.0.0.1:8080/admin"))
+    assert variants[0] == "http://127.0.0.1:8080/admin"
+    for host in ("2130706433", "0x7f000001", "017700000001", "0x7f.0x0.0x0.0x1", "0177.00.00.01",
+                 "127.0.1", "127.1", "[::ffff:127.0.0.1]", "[::ffff:7f00:1]", "[0:0:0:0:0:ffff:127.0.0.1]"):
+        assert f"http://{host}:8080/admin" in variants
+
+def test_ipv6_variants():
+    variants = list(target_variants("http://[::1]/"))
+    assert variants == ["http://[::1]/", "http://[0000:0000:0000:0000:0000:0000:0000:0001]/"]
+
+def test_hostname_and_schemes():
+    variants = list(target_variants("http://user@localhost/x?y=1", ["http", "https", "gopher"]))
+    assert variants == ["http://user@localhost/x?y=1", "https://user@localhost/x?y=1", "gopher://user@localhost/x?y=1"]
+
+def test_malformed_targets_are_kept():
+    for target in ("http://127.0.0.1:99999/", "http://127.0.0.1:80:443/", "http://[fe80::1%25eth0]/"):
+        assert list(target_variants(target, ["http", "https"])) == [target, "https" + target[len("http"):]]
+    assert list(target_variants("http://127.0.0.1:99999/")) == ["http://127.0.0.1:99999/"]
+    results = list(permute(["http://[fe80::1%25eth0]/"], [302], MAIN_DOMAIN))
+    assert encoder.decode(results[0].domain, MAIN_DOMAIN) == ("http://[fe80::1%25eth0]/", 302)
+
+def test_permute_decodes_back():
+    results = list(permute(["http://169.254.169.254/latest"], [302, 307], MAIN_DOMAIN, [None, "some.domain"]))
+    assert len(results) == len(list(target_variants("http://169.254.169.254/latest"))) * 4
+    for target, status_code, ignore_part, domain in results:
+        assert domain == encoder.encode(target, status_code, MAIN_DOMAIN, ignore_part)
+        assert encoder.decode(domain, MAIN_DOMAIN) == (target, status_code)
+
+def test_permute_deduplicates():
+    results = list(permute(["http://127.0.0.1/", "http://127.0.0.1/", "http://[::ffff:127.0.0.1]/"], [302], MAIN_DOMAIN))
+    targets = [result.target for result in results]
+    assert len(targets) == len(set(targets))
+
+def test_permute_compresses_once_per_target():
+    with mock.patch.object(permutations, "_b32encode_labels", wraps=encoder._b32encode_labels) as b32encode:
+        results = list(permute(["http://localhost/"], [301, 302, 303], MAIN_DOMAIN, [None, "a", "b"]))
+    assert len(results) == 9
+    assert b32encode.call_count == 1
+
+def test_permute_skips_too_long():
+    #HTTPS mode doesn't allow ignore parts
+    results = list(permute(["http://localhost/"], [302], MAIN_DOMAIN, [None, "a"], https_enforced=True))
+    assert [result.ignore_part for result in results] == [None]
+    with mock.patch.object(permutations, "_b32encode_labels", wraps=encoder._b32encode_labels) as b32encode:
+        assert list(permute(["http://localhost/"], [302], MAIN_DOMAIN, ["a" * 250])) == []
+    assert b32encode.call_count == 0
+
+    long_target = "http://localhost/" + "x" * 2000
+    with mock.patch.object(permutations, "_b32encode_labels", wraps=encoder._b32encode_labels) as b32encode:
+        assert list(permute([long_target], [302], MAIN_DOMAIN)) == []
+        silent = list(permute([long_target], [302], MAIN_DOMAIN, slient_mode=True))
+    assert b32encode.call_count == 0
+    assert silent[0].domain == encoder._error_domain(long_target, 302, MAIN_DOMAIN)
+
+def test_permute_skips_combinations_before_assembling():
+    with mock.patch.object(permutations, "_assemble_domain", wraps=encoder._assemble_domain) as assemble:
+        results = list(permute(["http://localhost/"], [302, 307], MAIN_DOMAIN, [None, "a" * 250]))
+    assert [(result.status_code, result.ignore_part) for result in results] == [(302, None), (307, None)]
+    assert assemble.call_count == 2
+
+def test_permute_is_lazy():
+    def targets():
+        yield "http://localhost/"
+        raise AssertionError("targets are consumed eagerly")
+    assert next(permute(targets(), [302], MAIN_DOMAIN)).target == "http://localhost/"
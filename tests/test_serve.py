@@ -0,0 +1,71 @@
+import time
+import socket
+import asyncio
+import argparse
+import http.client
+from r3dir import encoder
+from r3dir._cli import _server_settings, SERVER_SETTINGS
+from r3dir.server import serve
+from r3dir.server.serve import Supervisor
+
+MAIN_DOMAIN = "r3dir.me"
+
+def _get(port: int, host: str) -> http.client.HTTPResponse:
+    deadline = time.monotonic() + 30
+    while True:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        try:
+            connection.request("GET", "/", headers={"Host": host})
+            return connection.getresponse()
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+        finally:
+            connection.close()
+
+def test_server_settings_from_cli_options():
+    args = argparse.Namespace(**dict.fromkeys(SERVER_SETTINGS), main_domain="example.com")
+    args.fast_asgi, args.dns_a, args.decode_cache_size = True, ["192.0.2.1", "192.0.2.2"], 0
+    assert _server_settings(args) == {"MAIN_DOMAIN": "example.com", "FAST_ASGI": "true",
+                                      "DNS_A": "192.0.2.1,192.0.2.2", "DECODE_CACHE_SIZE": "0"}
+
+def test_bound_socket_connections_have_nodelay():
+    async def accepted_nodelay() -> int:
+        accepted = asyncio.get_running_loop().create_future()
+
+        class Protocol(asyncio.Protocol):
+            def connection_made(self, transport):
+                accepted.set_result(transport.get_extra_info("socket").getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY))
+
+        sock = serve.bind_socket("127.0.0.1", 0)
+        server = await asyncio.get_running_loop().create_server(Protocol, sock=sock)
+        _, writer = await asyncio.open_connection(*sock.getsockname())
+        nodelay = await asyncio.wait_for(accepted, 5)
+        writer.close()
+        server.close()
+        return nodelay
+    assert asyncio.run(accepted_nodelay())
+
+def test_supervisor_restarts_crashed_worker(monkeypatch):
+    monkeypatch.setenv("MAIN_DOMAIN", MAIN_DOMAIN)
+    #restart without crash loop delay
+    monkeypatch.setattr(serve, "MIN_UPTIME", 0)
+    supervisor = Supervisor(2, {"host": "127.0.0.1", "port": 0, "log_level": "warning"})
+    supervisor.start()
+    try:
+        port = supervisor.options["port"]
+        domain = encoder.encode("http://localhost/", 307, MAIN_DOMAIN)
+        response = _get(port, domain)
+        assert (response.status, response.getheader("location")) == (307, "http://localhost/")
+
+        crashed = supervisor.processes[0]
+        crashed.kill()
+        crashed.join()
+        supervisor.check(timeout=0)
+        assert supervisor.restarts == 1
+        assert supervisor.processes[0] is not crashed and supervisor.processes[0].is_alive()
+        assert _get(port, domain).status == 307
+    finally:
+        supervisor.stop()
+    assert not any(process.is_alive() for process in supervisor.processes)
@@ -0,0 +1,116 @@
+import json
+import time
+import asyncio
+import hashlib
+import pytest
+from r3dir import encoder
+from r3dir.exceptions import TooLongTarget
+from r3dir.server.cache import DecodeCache
+from r3dir.server.metrics import Metrics
+from r3dir.server.store import TargetStore, TargetStoreMiddleware
+
+MAIN_DOMAIN = "r3dir.me"
+#incompressible target, which doesn't fit the domain length limit with any codec
+LONG_TARGET = "http://10.0.0.1/" + "/".join(hashlib.sha256(str(i).encode()).hexdigest() for i in range(6))
+
+def _call(middleware, method: str, body: bytes, headers: list = ()):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+    asyncio.run(middleware({"type": "http", "path": "/--register/", "method": method, "headers": list(headers)}, receive, send))
+    return messages[0]["status"], json.loads(messages[1]["body"])
+
+def test_register_and_lookup(tmp_path):
+    store = TargetStore(str(tmp_path / "targets.db"))
+    short_id = store.register(LONG_TARGET)
+    assert short_id == encoder.short_id(LONG_TARGET)
+    assert store.register(LONG_TARGET) == short_id
+    assert store.lookup(short_id) == LONG_TARGET
+    assert store.lookup(encoder._target_hash(LONG_TARGET)) == LONG_TARGET
+    assert store.lookup(short_id + "0" * 24) is None
+    assert store.lookup("0" * 16) is None
+    assert len(store) == 1
+
+    #another worker process sees registered targets
+    assert TargetStore(str(tmp_path / "targets.db")).lookup(short_id) == LONG_TARGET
+
+def test_decode_cache_resolves_stored_targets(tmp_path):
+    store = TargetStore(str(tmp_path / "targets.db"))
+    cache = DecodeCache(MAIN_DOMAIN, store=store)
+    short_id_domain = encoder.short_id_domain(LONG_TARGET, 307, MAIN_DOMAIN, "some.domain")
+    error_domain = encoder.encode(LONG_TARGET, 301, MAIN_DOMAIN, slient_mode=True)
+
+    for domain in (short_id_domain, error_domain):
+        with pytest.raises(TooLongTarget):
+            cache.decode(domain)
+    store.register(LONG_TARGET)
+    assert cache.decode(short_id_domain) == (LONG_TARGET, 307)
+    assert cache.decode(error_domain) == (LONG_TARGET, 301)
+    assert cache.decode(error_domain) == (LONG_TARGET, 301)
+    assert cache.hits == 1
+
+def test_registration_endpoint(tmp_path):
+    store = TargetStore(str(tmp_path / "targets.db"))
+    middleware = TargetStoreMiddleware(None, store, MAIN_DOMAIN, token="secret")
+    request = json.dumps({"target": LONG_TARGET, "status_code": 307}).encode()
+
+    assert _call(middleware, "POST", request)[0] == 401
+    assert _call(middleware, "GET", request, [(b"authorization", b"Bearer secret")])[0] == 405
+    status_code, response = _call(middleware, "POST", request, [(b"authorization", b"Bearer secret")])
+    assert status_code == 200
+    assert response["domain"] == encoder.short_id_domain(LONG_TARGET, 307, MAIN_DOMAIN)
+    assert store.lookup(response["short_id"]) == LONG_TARGET
+
+    status_code, response = _call(middleware, "POST", b'{"target": "http://x", "status_code": 100}',
+                                  [(b"authorization", b"Bearer secret")])
+    assert status_code == 400
+
+def test_unknown_short_ids_are_cached(tmp_path, monkeypatch):
+    store = TargetStore(str(tmp_path / "targets.db"), negative_ttl=60)
+    other_worker = TargetStore(str(tmp_path / "targets.db"))
+    cache = DecodeCache(MAIN_DOMAIN, store=store)
+    domain = encoder.short_id_domain(LONG_TARGET, 302, MAIN_DOMAIN)
+
+    for _ in range(3):
+        with pytest.raises(TooLongTarget):
+            asyncio.run(cache.decode_async(domain))
+    assert store.misses == 1
+    other_worker.register(LONG_TARGET)
+    with pytest.raises(TooLongTarget):
+        asyncio.run(cache.decode_async(domain))
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert asyncio.run(cache.decode_async(domain)) == (LONG_TARGET, 302)
+    assert store.misses == 2
+
+def test_registration_clears_unknown_short_id(tmp_path):
+    store = TargetStore(str(tmp_path / "targets.db"), negative_ttl=60)
+    short_id = encoder._target_hash(LONG_TARGET)[:encoder.SHORT_ID_LENGTH]
+    assert store.lookup(short_id) is None
+    store.register(LONG_TARGET)
+    assert store.lookup(short_id) == LONG_TARGET
+
+def test_decode_async_queries_store_in_thread(tmp_path, monkeypatch):
+    store = TargetStore(str(tmp_path / "targets.db"))
+    store.register(LONG_TARGET)
+    cache = DecodeCache(MAIN_DOMAIN, store=TargetStore(str(tmp_path / "targets.db")))
+    threads = []
+    monkeypatch.setattr(asyncio, "to_thread", lambda func, *args: threads.append(func) or asyncio.sleep(0, func(*args)))
+    domain = encoder.short_id_domain(LONG_TARGET, 302, MAIN_DOMAIN)
+    assert asyncio.run(cache.decode_async(domain)) == (LONG_TARGET, 302)
+    assert threads == [cache.store.resolve]
+
+def test_resolved_targets_are_not_decode_errors(tmp_path):
+    metrics = Metrics()
+    store = TargetStore(str(tmp_path / "targets.db"))
+    cache = DecodeCache(MAIN_DOMAIN, decode=metrics.decode, store=store, on_error=metrics.count_decode_error)
+    with pytest.raises(TooLongTarget):
+        cache.decode(encoder.short_id_domain(LONG_TARGET, 302, MAIN_DOMAIN))
+    store.register(LONG_TARGET)
+    assert asyncio.run(cache.decode_async(encoder.short_id_domain(LONG_TARGET, 301, MAIN_DOMAIN))) == (LONG_TARGET, 301)
+    assert metrics.decode_errors == {"TooLongTarget": 1}